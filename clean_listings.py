@@ -0,0 +1,139 @@
+import argparse
+import gzip
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# Scrape-only columns the notebook drops before training
+DROP_COLUMNS = {"Agency", "link"}
+PRICE_COLUMN = "Price"
+NUMERIC_COLUMNS = {"sq_mtrs", "Bedrooms", "Bathrooms"}
+
+# Rows read and cleaned at a time
+CHUNK_ROWS = int(os.environ.get("CLEAN_CHUNK_ROWS", "200000"))
+
+# Everything the notebook stripped from prices ("KSh", spaces, commas), in one pass
+_PRICE_JUNK = r"KSh|[\s,]"
+
+
+def parse_prices(prices: pd.Series) -> pd.Series:
+    """
+    Prices like "KSh 155,000" as float64; anything that isn't a number becomes NaN.
+    """
+    return pd.to_numeric(prices.astype(str).str.replace(_PRICE_JUNK, "", regex=True), errors="coerce")
+
+
+class RowHashes:
+    """
+    64-bit hashes of every distinct row seen so far, as a few sorted uint64 runs, so
+    duplicates are found across chunks at 8 bytes per kept row.
+
+    Each chunk's new hashes become a run of their own, and a run is merged into the
+    one before it once it's at least as large, so every hash is merged O(log n)
+    times and there are never more than O(log n) runs to search.
+    """
+
+    def __init__(self):
+        self.runs: list[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return sum(len(run) for run in self.runs)
+
+    def first_seen(self, frame: pd.DataFrame) -> np.ndarray:
+        """
+        Mask of the rows in `frame` not seen before (in this or an earlier frame).
+        """
+        hashes = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+        # First occurrence of each hash within the chunk, in row order
+        unique, first = np.unique(hashes, return_index=True)
+        known = np.zeros(len(unique), dtype=bool)
+        for run in self.runs:
+            positions = np.minimum(np.searchsorted(run, unique), len(run) - 1)
+            known |= run[positions] == unique
+        keep = np.zeros(len(frame), dtype=bool)
+        keep[first[~known]] = True
+
+        if not known.all():
+            self.runs.append(unique[~known])
+            while len(self.runs) > 1 and len(self.runs[-1]) >= len(self.runs[-2]):
+                self.runs[-2:] = [np.union1d(self.runs[-2], self.runs[-1])]
+        return keep
+
+
+def clean_chunk(chunk: pd.DataFrame, row_hashes: RowHashes) -> tuple[pd.DataFrame, int]:
+    """
+    The notebook's cleaning for one chunk of raw listings (read as strings): drop
+    the scrape-only columns, parse prices, drop rows without one and rows already
+    seen, and move Price to the last column. Returns the cleaned rows and how many
+    rows had no price.
+    """
+    chunk = chunk.drop(columns=[c for c in chunk.columns if c in DROP_COLUMNS])
+    chunk[PRICE_COLUMN] = parse_prices(chunk[PRICE_COLUMN])
+    for column in NUMERIC_COLUMNS.intersection(chunk.columns):
+        chunk[column] = pd.to_numeric(chunk[column], errors="coerce").astype("float64")
+    priced = chunk[PRICE_COLUMN].notna().to_numpy()
+    chunk = chunk[priced].astype({PRICE_COLUMN: "int64"})
+    chunk = chunk[row_hashes.first_seen(chunk)]
+    columns = [c for c in chunk.columns if c != PRICE_COLUMN] + [PRICE_COLUMN]
+    return chunk[columns], int((~priced).sum())
+
+
+def iter_clean_chunks(path: str, chunk_rows: int = CHUNK_ROWS, stats: dict | None = None):
+    """
+    Cleaned DataFrames for the listings CSV at `path` (optionally gzipped), reading
+    `chunk_rows` rows at a time. Duplicates are dropped across the whole file.
+    """
+    row_hashes = RowHashes()
+    stats = stats if stats is not None else {}
+    stats.update(read=0, no_price=0, duplicates=0, written=0)
+    # Everything as text, so a column's type can't change from one chunk to the next
+    reader = pd.read_csv(path, dtype=str, chunksize=chunk_rows, usecols=lambda column: column not in DROP_COLUMNS)
+    with reader:
+        for chunk in reader:
+            if PRICE_COLUMN not in chunk.columns:
+                raise ValueError(f"{path}: missing column {PRICE_COLUMN}")
+            cleaned, no_price = clean_chunk(chunk, row_hashes)
+            stats["read"] += len(chunk)
+            stats["no_price"] += no_price
+            stats["duplicates"] += len(chunk) - no_price - len(cleaned)
+            stats["written"] += len(cleaned)
+            yield cleaned
+
+
+def clean_file(path: str, out_path: str, chunk_rows: int = CHUNK_ROWS) -> dict:
+    """
+    Clean the listings CSV at `path` into `out_path` (gzipped when it ends in .gz),
+    one chunk at a time. Output goes to a temporary file next to `out_path` that
+    replaces it only once the whole input has been read.
+    """
+    started = time.perf_counter()
+    stats = {}
+    fd, tmp_path = tempfile.mkstemp(prefix=".clean-", dir=os.path.dirname(os.path.abspath(out_path)))
+    try:
+        with os.fdopen(fd, "wb") as raw:
+            out = gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) if out_path.endswith(".gz") else raw
+            with out:
+                header = True
+                for cleaned in iter_clean_chunks(path, chunk_rows, stats):
+                    out.write(cleaned.to_csv(index=False, header=header).encode("utf-8"))
+                    header = False
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return {"file": path, **stats, "seconds": round(time.perf_counter() - started, 2)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clean scraped listing CSVs the way the training notebook does.")
+    parser.add_argument("path", help="Raw listings CSV (.csv or .csv.gz) with a header row")
+    parser.add_argument("out", help="Cleaned CSV to write (.csv or .csv.gz)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="Rows read at a time")
+    args = parser.parse_args()
+
+    stats = clean_file(args.path, args.out, args.chunk_rows)
+    print(f"{stats['file']}: {stats['read']:,} rows read, {stats['no_price']:,} without a price, "
+          f"{stats['duplicates']:,} duplicates, {stats['written']:,} written to {args.out}, {stats['seconds']}s")
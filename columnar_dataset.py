@@ -0,0 +1,173 @@
+import argparse
+import hashlib
+import os
+
+import pandas as pd
+
+# Column types of the reference listings (dataset/*.csv, preprocessed.csv in storage):
+# locations as categoricals (dictionary-encoded on disk), room counts as nullable int8
+CATEGORY_COLUMNS = ["Sub_County", "Neighborhood"]
+SMALL_INT_COLUMNS = ["Bedrooms", "Bathrooms"]
+FLOAT_COLUMNS = ["sq_mtrs"]
+INT_COLUMNS = ["Price"]
+
+# Uncompressed Arrow IPC files can be memory-mapped and read without copying;
+# Parquet is smaller but is always decoded into fresh memory
+ARROW = ".arrow"
+PARQUET = ".parquet"
+
+HASH_KEY = b"content_hash"
+
+
+def normalize_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Copy of `frame` with the compact column types. Categories are sorted, so the same
+    rows always encode the same way. Raises ValueError if a room count isn't a whole
+    number that fits in int8.
+    """
+    frame = frame.copy()
+    for column in CATEGORY_COLUMNS:
+        if column in frame.columns:
+            values = frame[column].astype("string").astype(object).where(frame[column].notna())
+            frame[column] = pd.Categorical(values, categories=sorted(values.dropna().unique()))
+    for column in SMALL_INT_COLUMNS:
+        if column in frame.columns:
+            frame[column] = pd.to_numeric(frame[column], errors="raise").astype("Int8")
+    for column in FLOAT_COLUMNS:
+        if column in frame.columns:
+            frame[column] = pd.to_numeric(frame[column], errors="raise").astype("float64")
+    for column in INT_COLUMNS:
+        if column in frame.columns:
+            frame[column] = pd.to_numeric(frame[column], errors="raise").astype("int64")
+    return frame
+
+
+def content_hash(frame: pd.DataFrame) -> str:
+    """
+    SHA-256 over the column names, types and row hashes of a normalized frame. It
+    depends only on the data, not on the file format or how categories are encoded.
+    """
+    digest = hashlib.sha256()
+    for column, dtype in frame.dtypes.items():
+        digest.update(f"{column}:{'category' if isinstance(dtype, pd.CategoricalDtype) else dtype};".encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def write_dataset(frame: pd.DataFrame, path: str) -> str:
+    """
+    Write `frame` (normalized first) to `path`, as Arrow IPC or Parquet by extension,
+    with its content hash in the schema metadata. Returns the hash.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    frame = normalize_frame(frame)
+    digest = content_hash(frame)
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), HASH_KEY: digest.encode("ascii")})
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # Write to a temp file first so readers never see a half-written file
+    if path.endswith(ARROW):
+        with pa.OSFile(path + ".tmp", "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    elif path.endswith(PARQUET):
+        pq.write_table(table, path + ".tmp")
+    else:
+        raise ValueError(f"Unknown dataset format: {path}")
+    os.replace(path + ".tmp", path)
+    return digest
+
+
+def read_dataset(path: str, verify: bool = False) -> pd.DataFrame:
+    """
+    Load a file written by write_dataset. Arrow IPC files are memory-mapped, and
+    numeric columns without nulls are handed to pandas without a copy. The stored
+    content hash is in `frame.attrs["content_hash"]`; with `verify` it is checked
+    against the loaded rows.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if path.endswith(ARROW):
+        with pa.memory_map(path, "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+    elif path.endswith(PARQUET):
+        table = pq.read_table(path, memory_map=True)
+    else:
+        raise ValueError(f"Unknown dataset format: {path}")
+
+    frame = table.to_pandas(split_blocks=True, types_mapper={pa.int8(): pd.Int8Dtype()}.get)
+    digest = (table.schema.metadata or {}).get(HASH_KEY, b"").decode("ascii")
+    if verify and content_hash(frame) != digest:
+        raise ValueError(f"{path}: content hash mismatch")
+    frame.attrs["content_hash"] = digest
+    return frame
+
+
+def convert_csv(csv_path: str, out_path: str) -> str:
+    """
+    Convert a reference CSV to the columnar format; returns its content hash.
+    """
+    return write_dataset(pd.read_csv(csv_path), out_path)
+
+
+def _benchmark(csv_path: str, scale: int) -> None:
+    import subprocess
+    import sys
+    import tempfile
+
+    # Each load runs in a fresh interpreter; RSS is the resident set (including touched
+    # pages of a memory-mapped file) after the load minus before it, from /proc (Linux)
+    probe = (
+        "import os, sys, time\n"
+        "import pandas as pd\n"
+        "import pyarrow\n"
+        "import columnar_dataset\n"
+        "def rss():\n"
+        "    with open('/proc/self/statm') as f:\n"
+        "        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')\n"
+        "baseline = rss()\n"
+        "start = time.perf_counter()\n"
+        "path = sys.argv[1]\n"
+        "frame = pd.read_csv(path) if path.endswith('.csv') else columnar_dataset.read_dataset(path)\n"
+        "elapsed = time.perf_counter() - start\n"
+        "print(elapsed, rss() - baseline, frame.memory_usage(deep=True).sum())\n"
+    )
+    here = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as directory:
+        frame = pd.read_csv(csv_path)
+        frame = pd.concat([frame] * scale, ignore_index=True)
+        paths = {"csv": os.path.join(directory, "data.csv")}
+        frame.to_csv(paths["csv"], index=False)
+        for name, extension in (("arrow", ARROW), ("parquet", PARQUET)):
+            paths[name] = os.path.join(directory, "data" + extension)
+            write_dataset(frame, paths[name])
+
+        print(f"{os.path.basename(csv_path)} x{scale}: {len(frame):,} rows")
+        for name, path in paths.items():
+            result = subprocess.run([sys.executable, "-c", probe, path], cwd=here,
+                                    capture_output=True, text=True, check=True)
+            elapsed, grown, in_memory = (float(v) for v in result.stdout.split())
+            print(f"  {name:<8} {os.path.getsize(path) / 1e6:7.1f} MB file, load {elapsed * 1000:8.1f} ms, "
+                  f"RSS +{grown / 1e6:7.1f} MB, frame {in_memory / 1e6:7.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert reference listing CSVs to Arrow IPC or Parquet.")
+    parser.add_argument("paths", nargs="+", help="Reference CSV files")
+    parser.add_argument("--format", choices=["arrow", "parquet"], default="arrow",
+                        help="Output format, written next to each CSV (default: arrow)")
+    parser.add_argument("--benchmark", type=int, metavar="SCALE",
+                        help="Instead of converting, compare load time and RSS against pd.read_csv "
+                             "on each CSV repeated SCALE times")
+    args = parser.parse_args()
+
+    for path in args.paths:
+        if args.benchmark:
+            _benchmark(path, args.benchmark)
+            continue
+        out_path = os.path.splitext(path)[0] + (ARROW if args.format == "arrow" else PARQUET)
+        digest = convert_csv(path, out_path)
+        print(f"{path} -> {out_path} ({os.path.getsize(out_path) / 1e3:,.1f} kB, sha256 {digest[:16]})")
@@ -0,0 +1,184 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+
+EXACT_KEY = ["Sub_County", "Neighborhood", "sq_mtrs", "Bedrooms", "Bathrooms"]
+ROOMS_KEY = ["Sub_County", "Neighborhood", "Bedrooms", "Bathrooms"]
+NEIGHBORHOOD_KEY = ["Sub_County", "Neighborhood"]
+
+
+@dataclass(frozen=True)
+class GroupStats:
+    count: int
+    median: float
+    q25: float
+    q75: float
+
+
+def _key(*values) -> tuple:
+    # Numbers are stored as floats so 3, 3.0 and np.float64(3) all hash the same
+    return tuple(v if isinstance(v, str) else float(v) for v in values)
+
+
+def _group_stats(data: pd.DataFrame, keys: list) -> dict:
+    grouped = data.groupby(keys, sort=False, observed=True)["Price"]
+    stats = pd.DataFrame({
+        "count": grouped.size(),
+        "median": grouped.median(),
+        "q25": grouped.quantile(0.25),
+        "q75": grouped.quantile(0.75),
+    })
+    return {
+        _key(*(key if isinstance(key, tuple) else (key,))): GroupStats(int(c), float(m), float(lo), float(hi))
+        for key, c, m, lo, hi in zip(stats.index, stats["count"], stats["median"], stats["q25"], stats["q75"])
+    }
+
+
+class ComparablesIndex:
+    """
+    Hash index over the reference listings for the "exact rent price" and
+    "similar properties" lookups, so each request is a dictionary probe instead of
+    boolean masks over the whole frame. Rows with a missing key column are left out,
+    matching the `==` masks they replace.
+    """
+
+    def __init__(self, data: pd.DataFrame):
+        data = data.dropna(subset=["Price"])
+
+        # First listed price per exact (location, size, rooms) combination
+        exact = data.dropna(subset=EXACT_KEY).drop_duplicates(EXACT_KEY, keep="first")
+        self.exact = {
+            _key(*row[:-1]): row[-1]
+            for row in exact[EXACT_KEY + ["Price"]].itertuples(index=False, name=None)
+        }
+        self.rooms = _group_stats(data.dropna(subset=ROOMS_KEY), ROOMS_KEY)
+        self.neighborhoods = _group_stats(data.dropna(subset=NEIGHBORHOOD_KEY), NEIGHBORHOOD_KEY)
+
+    def exact_price(self, sub_county, neighborhood, sq_mtrs, bedrooms, bathrooms):
+        if any(pd.isna(v) for v in (sq_mtrs, bedrooms, bathrooms)):
+            return None
+        return self.exact.get(_key(sub_county, neighborhood, sq_mtrs, bedrooms, bathrooms))
+
+    def room_stats(self, sub_county, neighborhood, bedrooms, bathrooms) -> GroupStats | None:
+        if pd.isna(bedrooms) or pd.isna(bathrooms):
+            return None
+        return self.rooms.get(_key(sub_county, neighborhood, bedrooms, bathrooms))
+
+    def neighborhood_stats(self, sub_county, neighborhood) -> GroupStats | None:
+        return self.neighborhoods.get(_key(sub_county, neighborhood))
+
+    def estimate(self, sub_county, neighborhood, bedrooms, bathrooms) -> float:
+        """
+        Median price of listings with the same rooms in the neighborhood, falling back
+        to the whole neighborhood. NaN when the neighborhood has no listings.
+        """
+        stats = self.room_stats(sub_county, neighborhood, bedrooms, bathrooms)
+        if stats is None:
+            stats = self.neighborhood_stats(sub_county, neighborhood)
+        return stats.median if stats is not None else np.nan
+
+
+class NearestComparables:
+    """
+    k-nearest comparable listings over scaled (sq_mtrs, Bedrooms, Bathrooms).
+
+    One KD-tree per neighborhood, with a sub-county tree as fallback when the
+    neighborhood has fewer than `min_listings` listings. Trees are built on first
+    use and kept in an LRU of at most `max_trees`, so memory stays bounded however
+    many neighborhoods the listing set grows to.
+    """
+
+    FEATURES = ["sq_mtrs", "Bedrooms", "Bathrooms"]
+
+    def __init__(self, data: pd.DataFrame, max_trees: int = 256, min_listings: int = 3):
+        self.max_trees = max_trees
+        self.min_listings = min_listings
+        data = data.dropna(subset=NEIGHBORHOOD_KEY + ["Price"]).reset_index(drop=True)
+        self.listings = data[NEIGHBORHOOD_KEY + self.FEATURES + ["Price"]]
+
+        # Median/IQR scaling keeps a few huge sq_mtrs outliers from flattening the other axes
+        features = data[self.FEATURES].astype(np.float64)
+        self.fill = features.median().to_numpy()
+        q25, q75 = features.quantile(0.25).to_numpy(), features.quantile(0.75).to_numpy()
+        self.scale = np.where(q75 - q25 > 0, q75 - q25, 1.0)
+        features = features.fillna(pd.Series(self.fill, index=self.FEATURES)).to_numpy()
+        self.points = np.ascontiguousarray((features - self.fill) / self.scale)
+
+        # Row positions of every neighborhood and sub county
+        self.rows = {
+            ("neighborhood",) + _key(*key): rows
+            for key, rows in data.groupby(NEIGHBORHOOD_KEY, sort=False, observed=True).indices.items()
+        }
+        self.rows.update({
+            ("sub_county", key): rows for key, rows in data.groupby("Sub_County", sort=False, observed=True).indices.items()
+        })
+        self._trees: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _tree(self, key):
+        with self._lock:
+            tree = self._trees.get(key)
+            if tree is not None:
+                self._trees.move_to_end(key)
+                return tree
+        tree = KDTree(self.points[self.rows[key]])
+        with self._lock:
+            self._trees[key] = tree
+            self._trees.move_to_end(key)
+            while len(self._trees) > self.max_trees:
+                self._trees.popitem(last=False)
+        return tree
+
+    def nearest(self, sub_county, neighborhood, sq_mtrs, bedrooms, bathrooms, k: int = 5) -> pd.DataFrame:
+        """
+        Up to `k` nearest listings with their Price and a `distance` column, closest first.
+        """
+        key = ("neighborhood",) + _key(sub_county, neighborhood)
+        if len(self.rows.get(key, ())) < self.min_listings:
+            key = ("sub_county", sub_county)
+            if key not in self.rows:
+                return self.listings.iloc[:0].assign(distance=pd.Series(dtype=np.float64))
+
+        query = np.array([sq_mtrs, bedrooms, bathrooms], dtype=np.float64)
+        query = np.where(np.isnan(query), self.fill, query)
+        rows = self.rows[key]
+        distance, position = self._tree(key).query(((query - self.fill) / self.scale)[np.newaxis, :], k=min(k, len(rows)))
+        return self.listings.iloc[rows[position[0]]].assign(distance=distance[0])
+
+
+# Indexes for the current reference-data version, shared across sessions
+_index: tuple[str, ComparablesIndex] | None = None
+_nearest: tuple[str, NearestComparables] | None = None
+_lock = threading.Lock()
+
+
+def comparables_index(reference) -> ComparablesIndex:
+    """
+    Index for a `reference_data.ReferenceData`, rebuilt only when its version changes.
+    """
+    global _index
+    index = _index
+    if index is not None and index[0] == reference.version:
+        return index[1]
+    with _lock:
+        if _index is None or _index[0] != reference.version:
+            _index = (reference.version, ComparablesIndex(reference.frame))
+        return _index[1]
+
+
+def nearest_comparables(reference) -> NearestComparables:
+    """
+    k-NN engine for a `reference_data.ReferenceData`, rebuilt only when its version changes.
+    """
+    global _nearest
+    nearest = _nearest
+    if nearest is not None and nearest[0] == reference.version:
+        return nearest[1]
+    with _lock:
+        if _nearest is None or _nearest[0] != reference.version:
+            _nearest = (reference.version, NearestComparables(reference.frame))
+        return _nearest[1]
@@ -1,6 +1,14 @@
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
 import psycopg2
+import psycopg2.errors
+import psycopg2.extras
+from psycopg2 import pool
 from dotenv import load_dotenv
-import os
 
 # Load environment variables from .env
 load_dotenv()
@@ -12,31 +20,276 @@ HOST = os.getenv("host")
 PORT = os.getenv("port")
 DBNAME = os.getenv("dbname")
 
-# Connect to the database
-try:
-    connection = psycopg2.connect(
-        user=USER,
-        password=PASSWORD,
-        host=HOST,
-        port=PORT,
-        dbname=DBNAME
-    )
-    print("Connection successful!")
-    
-    # Create a cursor to execute SQL queries
-    cursor = connection.cursor()
-    
-    # Example query
-    cursor.execute("SELECT NOW();")
-    result = cursor.fetchone()
-    print("Current Time:", result)
-
-    # Close the cursor and connection
-    cursor.close()
-    connection.close()
-    print("Connection closed.")
-
-except Exception as e:
-    print(f"Failed to connect: {e}")
-
-print(f"USER: {USER}, PASSWORD: {PASSWORD}, HOST: {HOST}, PORT: {PORT}, DBNAME: {DBNAME}")
+# Pool size: Streamlit runs each session's script in its own thread, so allow roughly
+# one connection per concurrently active session; callers wait up to POOL_TIMEOUT for one.
+# psycopg2 closes returned connections beyond POOL_MIN, so that is also how many stay open idle.
+POOL_MIN = int(os.environ.get("PG_POOL_MIN", "4"))
+POOL_MAX = int(os.environ.get("PG_POOL_MAX", "20"))
+POOL_TIMEOUT = float(os.environ.get("PG_POOL_TIMEOUT", "10"))
+CONNECT_TIMEOUT = int(os.environ.get("PG_CONNECT_TIMEOUT", "5"))
+STATEMENT_TIMEOUT_MS = int(os.environ.get("PG_STATEMENT_TIMEOUT_MS", "10000"))
+
+# Connections are replaced after MAX_CONNECTION_AGE seconds, and checked with a
+# `select 1` before reuse when idle for longer than HEALTH_CHECK_IDLE seconds
+MAX_CONNECTION_AGE = float(os.environ.get("PG_MAX_CONNECTION_AGE", "1800"))
+HEALTH_CHECK_IDLE = float(os.environ.get("PG_HEALTH_CHECK_IDLE", "30"))
+
+# Rows per multi-row insert statement for batch uploads
+INSERT_PAGE_SIZE = 500
+
+# Server-side prepared statements only live on one backend session. A transaction-mode
+# pooler (Supabase's Supavisor on port 6543, PgBouncer) may run each transaction on a
+# different backend, and doesn't pass startup options through, so there statements are
+# sent as plain parameterized queries and the statement timeout is set per transaction.
+# PG_PREPARED_STATEMENTS: "auto" (off for a pooler host/port), "on" or "off".
+TRANSACTION_POOLER = "pooler." in (HOST or "") or PORT == "6543"
+_prepared_setting = os.environ.get("PG_PREPARED_STATEMENTS", "auto").lower()
+USE_PREPARED_STATEMENTS = (not TRANSACTION_POOLER) if _prepared_setting == "auto" else _prepared_setting == "on"
+
+# Server-side prepared statements, created once per connection. Keyed by the
+# sql/report_functions.sql function they stand in for (same parameter order), so
+# report_queries can call either these or supabase.rpc() with the same arguments.
+PREPARED_STATEMENTS = {
+    "prediction_insert": (
+        ["user_id", "sub_county", "neighborhood", "sq_mtrs", "bedrooms", "bathrooms",
+         "predicted_price", "predicted_price_range", "timestamp"],
+        "(text, text, text, double precision, integer, integer, double precision, text, timestamp)",
+        "insert into public.prediction (user_id, sub_county, neighborhood, sq_mtrs, bedrooms, bathrooms, "
+        "predicted_price, predicted_price_range, \"timestamp\") "
+        "values ($1, $2, $3, $4, $5, $6, $7, $8, $9) returning *",
+    ),
+    "prediction_report_neighborhoods": (
+        ["p_user_id"],
+        "(text)",
+        "select * from public.prediction_report_neighborhoods($1)",
+    ),
+    "prediction_report_summary": (
+        ["p_user_id", "p_neighborhoods"],
+        "(text, text[])",
+        "select * from public.prediction_report_summary($1, $2)",
+    ),
+    "prediction_report_page": (
+        ["p_user_id", "p_neighborhoods", "p_before_timestamp", "p_before_id", "p_limit"],
+        "(text, text[], timestamp, bigint, integer)",
+        "select * from public.prediction_report_page($1, $2, $3, $4, $5)",
+    ),
+    "prediction_history_since": (
+        ["p_user_id", "p_after_id", "p_limit"],
+        "(text, bigint, integer)",
+        "select * from public.prediction_history_since($1, $2, $3)",
+    ),
+}
+
+
+def _plain_sql(name: str) -> str:
+    # The prepared statement's SQL with each $n replaced by a %s placeholder cast to its type
+    _, types, sql = PREPARED_STATEMENTS[name]
+    types = [t.strip() for t in types.strip("()").split(",")]
+    return re.sub(r"\$(\d+)", lambda m: f"%s::{types[int(m.group(1)) - 1]}", sql)
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """Raised when no pooled connection becomes free within POOL_TIMEOUT seconds."""
+
+
+class Database:
+    """
+    Thread-safe Postgres access over a psycopg2 ThreadedConnectionPool.
+
+    `connection()` hands out a connection for one transaction (committed on success,
+    rolled back on error). Connections idle for a while are health-checked before
+    reuse and recycled once older than `max_age`, so dropped or long-lived server
+    sessions are replaced transparently. `call()` runs one of PREPARED_STATEMENTS,
+    server-side prepared unless `prepared` is off (behind a transaction pooler);
+    with `insert_predictions()` this is the prediction_store.PredictionStore interface
+    (PREDICTION_BACKEND=postgres).
+    """
+
+    def __init__(self, minconn: int = POOL_MIN, maxconn: int = POOL_MAX, timeout: float = POOL_TIMEOUT,
+                 max_age: float = MAX_CONNECTION_AGE, health_check_idle: float = HEALTH_CHECK_IDLE,
+                 prepared: bool = USE_PREPARED_STATEMENTS, statement_timeout_ms: int | None = None,
+                 **connect_kwargs):
+        self.timeout = timeout
+        self.max_age = max_age
+        self.health_check_idle = health_check_idle
+        self.prepared = prepared
+        # Set at the start of every transaction (instead of as a startup option)
+        self.statement_timeout_ms = statement_timeout_ms
+        self._pool = pool.ThreadedConnectionPool(minconn, maxconn, **connect_kwargs)
+        # ThreadedConnectionPool raises instead of waiting when exhausted; this makes callers wait
+        self._slots = threading.BoundedSemaphore(maxconn)
+        # Per-connection bookkeeping: id(conn) -> [created_at, last_used, prepared names]
+        self._meta: dict[int, list] = {}
+        self._meta_lock = threading.Lock()
+
+    def _info(self, conn) -> list:
+        with self._meta_lock:
+            info = self._meta.get(id(conn))
+            if info is None:
+                now = time.monotonic()
+                info = self._meta[id(conn)] = [now, now, set()]
+            return info
+
+    def _release(self, conn, close: bool = False) -> None:
+        self._pool.putconn(conn, close=close)
+        if conn.closed:
+            # The pool closes surplus connections; forget them so a new connection
+            # reusing the same id() doesn't inherit their age or prepared statements
+            with self._meta_lock:
+                self._meta.pop(id(conn), None)
+
+    def _discard(self, conn) -> None:
+        self._release(conn, close=True)
+
+    def _healthy(self, conn, info) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - info[0] > self.max_age:
+            return False
+        if time.monotonic() - info[1] > self.health_check_idle:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("select 1")
+                conn.rollback()
+            except psycopg2.Error:
+                return False
+        return True
+
+    def _checkout(self):
+        for _ in range(3):
+            conn = self._pool.getconn()
+            info = self._info(conn)
+            if self._healthy(conn, info):
+                return conn, info
+            self._discard(conn)
+        raise psycopg2.OperationalError("Could not get a healthy database connection")
+
+    @contextmanager
+    def connection(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(f"No database connection free after {self.timeout:.0f}s")
+        try:
+            conn, info = self._checkout()
+            broken = False
+            try:
+                self._begin(conn)
+                yield conn
+                conn.commit()
+            except Exception:
+                broken = conn.closed != 0
+                if not broken:
+                    try:
+                        conn.rollback()
+                    except psycopg2.Error:
+                        broken = True
+                raise
+            finally:
+                info[1] = time.monotonic()
+                self._release(conn, close=broken)
+        finally:
+            self._slots.release()
+
+    def _begin(self, conn) -> None:
+        if self.statement_timeout_ms is not None:
+            with conn.cursor() as cur:
+                cur.execute("set local statement_timeout = %s", (self.statement_timeout_ms,))
+
+    def _prepare(self, cur, info, name: str) -> None:
+        if name not in info[2]:
+            _, types, sql = PREPARED_STATEMENTS[name]
+            cur.execute(f"prepare {name} {types} as {sql}")
+            info[2].add(name)
+
+    def _execute(self, conn, cur, name: str, args: list) -> None:
+        # Runs as the first statement of the transaction, so a failure can be rolled back
+        # and retried without losing earlier work
+        if not self.prepared:
+            cur.execute(_plain_sql(name), args)
+            return
+        info = self._info(conn)
+        try:
+            self._prepare(cur, info, name)
+            cur.execute(f"execute {name} ({', '.join(['%s'] * len(args))})", args)
+        except (psycopg2.errors.InvalidSqlStatementName, psycopg2.errors.DuplicatePreparedStatement):
+            # The session doesn't match the cache (e.g. a pooler switched backends):
+            # start over with a fresh `prepare` on whatever session this is
+            conn.rollback()
+            self._begin(conn)
+            cur.execute("deallocate all")
+            info[2].clear()
+            self._prepare(cur, info, name)
+            cur.execute(f"execute {name} ({', '.join(['%s'] * len(args))})", args)
+
+    def call(self, name: str, params: dict) -> list:
+        """
+        Run statement `name` of PREPARED_STATEMENTS with `params` (keyed like the SQL
+        function's arguments) and return its rows as dicts.
+        """
+        args = [params.get(arg) for arg in PREPARED_STATEMENTS[name][0]]
+        with self.connection() as conn:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+                self._execute(conn, cur, name, args)
+                return [dict(row) for row in cur.fetchall()]
+
+    def insert_predictions(self, records: list[dict]) -> list[dict]:
+        """
+        Insert rows into `prediction` in one transaction; returns the stored rows.
+        A single row (the per-prediction hot path) uses the prepared statement,
+        larger batches one multi-row insert per INSERT_PAGE_SIZE rows.
+        """
+        names = PREPARED_STATEMENTS["prediction_insert"][0]
+        rows = [[record.get(name) for name in names] for record in records]
+        if not rows:
+            return []
+        with self.connection() as conn:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+                if len(rows) == 1:
+                    self._execute(conn, cur, "prediction_insert", rows[0])
+                    return [dict(cur.fetchone())]
+                columns = ", ".join(f'"{name}"' for name in names)
+                stored = psycopg2.extras.execute_values(
+                    cur, f"insert into public.prediction ({columns}) values %s returning *",
+                    rows, page_size=INSERT_PAGE_SIZE, fetch=True,
+                )
+                return [dict(row) for row in stored]
+
+    def close(self) -> None:
+        self._pool.closeall()
+
+
+# Process-wide pool shared by every session
+_database: Database | None = None
+_lock = threading.Lock()
+
+
+def get_database() -> Database | None:
+    """
+    The shared pool, or None when the Postgres credentials are not configured.
+    """
+    global _database
+    if _database is None and HOST and USER:
+        with _lock:
+            if _database is None:
+                connect_kwargs = dict(
+                    user=USER, password=PASSWORD, host=HOST, port=PORT, dbname=DBNAME,
+                    connect_timeout=CONNECT_TIMEOUT, application_name="price-scope",
+                )
+                if TRANSACTION_POOLER:
+                    # The pooler rejects or drops the `options` startup parameter
+                    _database = Database(statement_timeout_ms=STATEMENT_TIMEOUT_MS, **connect_kwargs)
+                else:
+                    _database = Database(options=f"-c statement_timeout={STATEMENT_TIMEOUT_MS}", **connect_kwargs)
+    return _database
+
+
+if __name__ == "__main__":
+    # Connectivity check: run a query through the pool
+    database = get_database()
+    if database is None:
+        print("Postgres credentials (user, password, host, port, dbname) are not set.")
+    else:
+        with database.connection() as conn, conn.cursor() as cur:
+            cur.execute("SELECT NOW();")
+            print("Current Time:", cur.fetchone())
+        print(f"Connected to {HOST}:{PORT}/{DBNAME} as {USER}")
+        database.close()
@@ -0,0 +1,70 @@
+import threading
+from dataclasses import dataclass
+
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class FormOptions:
+    sub_counties: list
+    neighborhoods: dict          # sub county -> sorted neighborhoods
+    bedrooms: dict               # (sub county, neighborhood) -> sorted bedroom counts
+    bathrooms: dict              # (sub county, neighborhood) -> sorted bathroom counts
+    all_bedrooms: list
+    all_bathrooms: list
+
+    def neighborhoods_for(self, sub_county) -> list:
+        return self.neighborhoods.get(sub_county, [])
+
+    def bedrooms_for(self, sub_county, neighborhood) -> list:
+        return self.bedrooms.get((sub_county, neighborhood)) or self.all_bedrooms
+
+    def bathrooms_for(self, sub_county, neighborhood) -> list:
+        return self.bathrooms.get((sub_county, neighborhood)) or self.all_bathrooms
+
+
+def build_form_options(data: pd.DataFrame) -> FormOptions:
+    """
+    Precompute the dependent option lists for the prediction form in one pass.
+    """
+    locations = data.dropna(subset=["Sub_County", "Neighborhood"])
+    neighborhoods = {
+        sub_county: sorted(group.unique().tolist())
+        for sub_county, group in locations.groupby("Sub_County", sort=True, observed=True)["Neighborhood"]
+    }
+
+    # Room counts may be stored as small ints; the form has always offered floats
+    def as_floats(values) -> list:
+        return sorted(pd.unique(values.dropna()).astype("float64").tolist())
+
+    def valid_counts(column):
+        counts = locations.dropna(subset=[column]).groupby(["Sub_County", "Neighborhood"], observed=True)[column]
+        return {key: as_floats(group) for key, group in counts}
+
+    return FormOptions(
+        sub_counties=list(neighborhoods),
+        neighborhoods=neighborhoods,
+        bedrooms=valid_counts("Bedrooms"),
+        bathrooms=valid_counts("Bathrooms"),
+        all_bedrooms=as_floats(data["Bedrooms"]),
+        all_bathrooms=as_floats(data["Bathrooms"]),
+    )
+
+
+# Index for the current reference-data version, shared across sessions
+_index: tuple[str, FormOptions] | None = None
+_lock = threading.Lock()
+
+
+def form_options(reference) -> FormOptions:
+    """
+    Option index for a `reference_data.ReferenceData`, rebuilt only when its version changes.
+    """
+    global _index
+    index = _index
+    if index is not None and index[0] == reference.version:
+        return index[1]
+    with _lock:
+        if _index is None or _index[0] != reference.version:
+            _index = (reference.version, build_form_options(reference.frame))
+        return _index[1]
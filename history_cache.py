@@ -0,0 +1,183 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from report_queries import FETCH_BATCH_SIZE, PAGE_SIZE, RemoteReport, ReportSummary, fetch_since
+
+# Users kept in memory, rows per user above which the report stays server-side, and
+# how long a synced history is trusted before asking Postgres for newer rows
+HISTORY_CACHE_USERS = int(os.environ.get("HISTORY_CACHE_USERS", "128"))
+HISTORY_CACHE_MAX_ROWS = int(os.environ.get("HISTORY_CACHE_MAX_ROWS", "20000"))
+HISTORY_CACHE_TTL = float(os.environ.get("HISTORY_CACHE_TTL", "60"))
+
+# Ids come from a sequence but concurrent inserts can commit out of id order, so a
+# row with a lower id may become visible after a higher one was read. Each sync
+# re-reads this many ids behind the highest one seen; rows already held are skipped.
+HISTORY_SYNC_OVERLAP_IDS = int(os.environ.get("HISTORY_SYNC_OVERLAP_IDS", "10000"))
+
+
+class _UserHistory:
+    def __init__(self):
+        self.frame = pd.DataFrame()    # newest first, like the report queries
+        self.pending: list[dict] = []  # rows not yet merged into `frame`
+        self.ids: set = set()
+        self.last_id = 0               # highest id read from the store
+        self.synced_at = 0.0
+        self.too_large = False
+        self.lock = threading.Lock()
+
+    def add(self, rows: list) -> None:
+        for row in rows:
+            if row.get("id") is not None and row["id"] not in self.ids:
+                self.ids.add(row["id"])
+                self.pending.append(row)
+
+    def merged(self) -> pd.DataFrame:
+        if self.pending:
+            new = pd.DataFrame(self.pending)
+            frame = pd.concat([self.frame, new], ignore_index=True) if not self.frame.empty else new
+            frame["predicted_price"] = pd.to_numeric(frame["predicted_price"], errors="coerce")
+            self.frame = frame.sort_values(["timestamp", "id"], ascending=False, ignore_index=True)
+            self.pending = []
+        return self.frame
+
+
+class HistoryCache:
+    """
+    Each user's prediction rows, kept in memory and brought up to date incrementally:
+    a sync only asks Postgres for rows from `overlap_ids` below the highest id read
+    onwards (skipping ones already held), and rows this process inserts are added as
+    soon as the insert returns them. A view within `ttl_seconds` of the last sync
+    needs no query at all.
+    """
+
+    def __init__(self, max_users: int = HISTORY_CACHE_USERS, max_rows: int = HISTORY_CACHE_MAX_ROWS,
+                 ttl_seconds: float = HISTORY_CACHE_TTL, overlap_ids: int = HISTORY_SYNC_OVERLAP_IDS):
+        self.max_users = max_users
+        self.max_rows = max_rows
+        self.ttl_seconds = ttl_seconds
+        self.overlap_ids = overlap_ids
+        self._users: OrderedDict[str, _UserHistory] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _entry(self, user_id: str, create: bool) -> _UserHistory | None:
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None:
+                self._users.move_to_end(user_id)
+            elif create:
+                entry = self._users[user_id] = _UserHistory()
+                while len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+            return entry
+
+    def history(self, store, user_id: str) -> pd.DataFrame | None:
+        """
+        All of the user's rows, newest first, or None when there are more than
+        `max_rows` of them (the caller should then query Postgres directly).
+        """
+        entry = self._entry(user_id, create=True)
+        with entry.lock:
+            # Histories only grow, so a user found too large once stays server-side
+            if not entry.too_large and time.monotonic() - entry.synced_at > self.ttl_seconds:
+                self._sync(store, user_id, entry)
+            if entry.too_large:
+                return None
+            return entry.merged()
+
+    def _sync(self, store, user_id: str, entry: _UserHistory) -> None:
+        after_id = max(0, entry.last_id - self.overlap_ids) if entry.last_id else 0
+        while True:
+            rows = fetch_since(store, user_id, after_id, FETCH_BATCH_SIZE)
+            if rows:
+                after_id = max(row["id"] for row in rows)
+                entry.last_id = max(entry.last_id, after_id)
+                entry.add(rows)
+            if len(entry.ids) > self.max_rows:
+                # Too big to hold; remember that instead of the rows
+                entry.too_large = True
+                entry.frame, entry.pending, entry.ids = pd.DataFrame(), [], set()
+            if entry.too_large or len(rows) < FETCH_BATCH_SIZE:
+                break
+        entry.synced_at = time.monotonic()
+
+    def add_stored(self, rows: list) -> None:
+        """
+        Rows returned by an insert into `prediction`. Only users whose history is
+        already cached are updated; `last_id` is left alone, so rows other processes
+        inserted in between are still picked up by the next sync.
+        """
+        by_user: dict[str, list] = {}
+        for row in rows or []:
+            by_user.setdefault(row.get("user_id"), []).append(row)
+        for user_id, user_rows in by_user.items():
+            entry = self._entry(user_id, create=False)
+            if entry is None:
+                continue
+            with entry.lock:
+                if not entry.too_large and entry.synced_at:
+                    entry.add(user_rows)
+
+    def report_source(self, store, user_id: str):
+        """
+        LocalReport over the cached rows, or a report_queries.RemoteReport when the
+        history is too large to cache.
+        """
+        frame = self.history(store, user_id)
+        return RemoteReport(store, user_id) if frame is None else LocalReport(frame)
+
+
+class LocalReport:
+    """
+    The report_queries.RemoteReport calls answered from an in-memory history frame
+    (newest first).
+    """
+
+    def __init__(self, frame: pd.DataFrame):
+        self.frame = frame
+
+    def _filtered(self, neighborhoods) -> pd.DataFrame:
+        if self.frame.empty or not neighborhoods:
+            return self.frame
+        return self.frame[self.frame["neighborhood"].isin(list(neighborhoods)).to_numpy()]
+
+    def neighborhoods(self) -> list:
+        if self.frame.empty:
+            return []
+        return sorted(self.frame["neighborhood"].dropna().unique().tolist())
+
+    def summary(self, neighborhoods=None) -> ReportSummary:
+        rows = self._filtered(neighborhoods)
+        if rows.empty:
+            return ReportSummary(0, np.nan, np.nan, np.nan, np.nan)
+        prices = rows["predicted_price"]
+        return ReportSummary(len(rows), prices.mean(), prices.min(), prices.max(), prices.std())
+
+    def page(self, neighborhoods=None, cursor=None, page_size: int = PAGE_SIZE):
+        rows = self._filtered(neighborhoods)
+        start = 0
+        if cursor and not rows.empty:
+            # Rows are sorted by (timestamp, id) descending; skip up to and including the cursor
+            before_timestamp, before_id = cursor
+            timestamps, ids = rows["timestamp"].to_numpy(), rows["id"].to_numpy()
+            after = (timestamps > before_timestamp) | ((timestamps == before_timestamp) & (ids >= before_id))
+            start = int(after.sum())
+        page = rows.iloc[start:start + page_size].reset_index(drop=True)
+        next_cursor = tuple(page[["timestamp", "id"]].iloc[-1].tolist()) if len(page) == page_size else None
+        return page.copy(), next_cursor
+
+    def pages(self, neighborhoods=None, page_size: int = FETCH_BATCH_SIZE):
+        rows = self._filtered(neighborhoods)
+        for start in range(0, len(rows), page_size):
+            yield rows.iloc[start:start + page_size]
+
+    def all_rows(self, neighborhoods=None) -> pd.DataFrame:
+        return self._filtered(neighborhoods).reset_index(drop=True).copy()
+
+
+# Process-wide cache shared by every session
+history_cache = HistoryCache()
@@ -4,15 +4,119 @@ import streamlit as st
 import pickle
 import pandas as pd
 import numpy as np
-import os
-import joblib
-from supabase import create_client, Client
-from io import StringIO
 from datetime import datetime
 import report
+from supabase_client import get_supabase
+from model_registry import get_model_artifacts
+from fast_encoder import compiled_encoder
+from svr_engine import svr_engine
+from quantile_intervals import QUANTILE, RESIDUAL, log_intervals
+from prediction_cache import CachedPrediction, prediction_cache
+from prediction_writer import QUEUED, SPOOLED, STORED, get_prediction_writer
+from history_cache import history_cache
+from prediction_store import get_prediction_store
+from reference_data import load_reference_data
+from form_options import form_options
+from market_stats import market_cube
 
 load_dotenv()
 
+# Columns the preprocessing pipeline expects, in form order
+FEATURE_COLUMNS = ["Sub_County", "Neighborhood", "sq_mtrs", "Bedrooms", "Bathrooms"]
+
+# Rows scored per transform/predict call, and rows sent per Supabase insert
+PREDICT_CHUNK_SIZE = 5000
+INSERT_BATCH_SIZE = 1000
+
+
+def predict_batch(df: pd.DataFrame, artifacts=None, chunk_size: int = PREDICT_CHUNK_SIZE,
+                  interval: str = RESIDUAL) -> pd.DataFrame:
+    """
+    Score every row of `df` and return a copy with predicted_price, lower_bound,
+    upper_bound and predicted_price_range columns added (95% interval, computed with
+    the `interval` method from quantile_intervals).
+    """
+    missing = [c for c in FEATURE_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+
+    if artifacts is None:
+        artifacts = get_model_artifacts()
+
+    encoder = compiled_encoder(artifacts)
+    engine = svr_engine(artifacts)
+    features = df[FEATURE_COLUMNS]
+    log_prediction = np.empty(len(df), dtype=np.float64)
+    lower_log = np.empty(len(df), dtype=np.float64)
+    upper_log = np.empty(len(df), dtype=np.float64)
+    for start in range(0, len(df), chunk_size):
+        chunk = features.iloc[start:start + chunk_size]
+        end = start + len(chunk)
+        X = encoder.encode_frame(chunk)
+        log_prediction[start:end] = engine.predict(X)
+        lower_log[start:end], upper_log[start:end] = log_intervals(
+            X, log_prediction[start:end], artifacts.residual_std_log, interval
+        )
+
+    # Reverse the logarithmic transformation for all rows at once
+    predicted_price = np.round(np.exp(log_prediction), -3)
+    lower_bound = np.round(np.exp(lower_log), -3)
+    upper_bound = np.round(np.exp(upper_log), -3)
+
+    scored = df.copy()
+    scored["predicted_price"] = predicted_price
+    scored["lower_bound"] = lower_bound
+    scored["upper_bound"] = upper_bound
+    scored["predicted_price_range"] = (
+        "KES " + pd.Series(lower_bound, index=df.index).map("{:,.0f}".format)
+        + " - " + pd.Series(upper_bound, index=df.index).map("{:,.0f}".format)
+    )
+    return scored
+
+
+def prediction_records(scored: pd.DataFrame, user_id: str) -> list[dict]:
+    """
+    Rows of the `prediction` table for a frame returned by predict_batch.
+    """
+    records = pd.DataFrame({
+        "user_id": user_id,
+        "sub_county": scored["Sub_County"].astype(str),
+        "neighborhood": scored["Neighborhood"].astype(str),
+        "sq_mtrs": scored["sq_mtrs"].astype("int64"),
+        "bedrooms": scored["Bedrooms"].astype("int64"),
+        "bathrooms": scored["Bathrooms"].astype("int64"),
+        "predicted_price": scored["predicted_price"].round(2),
+        "predicted_price_range": scored["predicted_price_range"],
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    })
+    return records.to_dict("records")
+
+
+def insert_predictions(store, records: list[dict], batch_size: int = INSERT_BATCH_SIZE) -> int:
+    """
+    Bulk-insert prediction rows in a few large requests. Returns the number stored.
+    """
+    stored = 0
+    for start in range(0, len(records), batch_size):
+        rows = store.insert_predictions(records[start:start + batch_size])
+        history_cache.add_stored(rows)
+        stored += len(rows)
+    return stored
+
+
+@st.fragment(run_every=1)
+def prediction_status(writer, ticket):
+    # Re-rendered every second on its own so the persistence result shows up asynchronously
+    status = writer.status(ticket)
+    if status == STORED:
+        st.success("Prediction stored successfully!")
+    elif status == QUEUED:
+        st.info("Saving prediction...")
+    elif status == SPOOLED:
+        st.warning("Supabase is unreachable. The prediction was saved locally and will be stored once it is back.")
+    else:
+        st.error("Failed to store the prediction in Supabase.")
+
 
 # Home page function with login and signup options
 def home_page():
@@ -90,30 +194,21 @@ def home_page():
 
 
     # Using Supabase to Store the csv file, access it and retrieve it.
-    # Supabase Initialization
-    
-    url = os.environ.get("supabase_url")
-    key = os.environ.get("supabase_key")
-    supabase: Client = create_client(url, key) # type: ignore
-
-
-    # Function to Read CSV from Supabase Storage
-    def read_csv_from_supabase(file_name):
-        file = supabase.storage.from_("RealEstateStorage").download(file_name)
-        # Convert the byte content to string, then use StringIO to read it as a CSV
-        file_str = file.decode("utf-8")  # Decode byte data to string
-        return pd.read_csv(StringIO(file_str))  # Use StringIO to read as CSV
-    
-    
-    # Load model and preprocessor
-    model = joblib.load("best_svm_model.pkl")
-    preprocessor = joblib.load("pipeline.pkl")
-
-    # Loading the saved Residual std
-    residual_std_log = joblib.load("residual_std_log.pkl")
-
-    # Read CSV from Supabase directly without downloading
-    data = read_csv_from_supabase("preprocessed.csv")
+    # Shared Supabase client (one per process, pooled connections)
+    supabase = get_supabase()
+
+
+    # Load model, preprocessor and the saved Residual std (loaded once per process)
+    artifacts = get_model_artifacts()
+    model = svr_engine(artifacts)  # NumPy SVR decision function, no sklearn on the request path
+    encoder = compiled_encoder(artifacts)  # Fast single-row path for the preprocessor
+    residual_std_log = artifacts.residual_std_log
+
+    # Reference data from Supabase storage, cached in memory and on disk
+    reference = load_reference_data(supabase, "preprocessed.csv")
+
+    # Dependent option lists, precomputed once per reference-data version
+    options = form_options(reference)
 
     # Prediction Section
     st.write("\n")
@@ -134,23 +229,38 @@ def home_page():
             unsafe_allow_html=True
         )
 
-    # Create a form to collect user input
-    with st.form("house_prediction_form"):
-        # Sub county
-        selected_sub_county = st.selectbox("Select the Sub County", options=data['Sub_County'].unique())
+    # Location and room selectors sit outside the form so that changing the sub county
+    # or neighborhood immediately narrows the options below it
+    # Sub county
+    selected_sub_county = st.selectbox("Select the Sub County", options=options.sub_counties)
 
-        # Neighborhood
-        selected_neighborhood = st.selectbox("Select a Neighborhood", options=data['Neighborhood'].unique())
+    # Neighborhood (only those in the chosen sub county)
+    selected_neighborhood = st.selectbox(
+        "Select a Neighborhood", options=options.neighborhoods_for(selected_sub_county)
+    )
 
-        # Square Meters
-        selected_square_mtrs = st.number_input("Enter the square footage of the house", min_value=1, step=1)
+    # Bedrooms
+    selected_bedrooms = st.selectbox(
+        "Select Number of Bedrooms", options=options.bedrooms_for(selected_sub_county, selected_neighborhood)
+    )
 
-        # Bedrooms
-        selected_bedrooms = st.selectbox("Select Number of Bedrooms", options=sorted(data['Bedrooms'].dropna().unique()))
+    # Bathrooms
+    selected_bathrooms = st.selectbox(
+        "Select Number of Bathrooms", options=options.bathrooms_for(selected_sub_county, selected_neighborhood)
+    )
 
-        # Bathrooms
-        selected_bathrooms = st.selectbox("Select Number of Bathrooms", options=sorted(data['Bathrooms'].dropna().unique()))
+    # Create a form to collect user input
+    with st.form("house_prediction_form"):
+        # Square Meters
+        selected_square_mtrs = st.number_input("Enter the square footage of the house", min_value=1, step=1)
 
+        # Interval method
+        interval_method = st.radio(
+            "Price range method",
+            options=[RESIDUAL, QUANTILE],
+            format_func=lambda m: {RESIDUAL: "SVR residuals (fixed width)", QUANTILE: "Quantile models (per property)"}[m],
+            horizontal=True,
+        )
 
         col_submitted, col_report = st.columns([0.2, 1.5])
 
@@ -166,33 +276,42 @@ def home_page():
         if "user" not in st.session_state:
             st.warning("You need to log in to make a prediction.")
         else:
-            # Combine user input into a single DataFrame only if user is logged in
-            user_input = pd.DataFrame({
-                "Sub_County": [selected_sub_county],
-                "Neighborhood": [selected_neighborhood],
-                "sq_mtrs": [selected_square_mtrs],
-                "Bedrooms": [selected_bedrooms],
-                "Bathrooms": [selected_bathrooms],
-            })
+            # Combine user input into a single row only if user is logged in
+            user_input = {
+                "Sub_County": selected_sub_county,
+                "Neighborhood": selected_neighborhood,
+                "sq_mtrs": selected_square_mtrs,
+                "Bedrooms": selected_bedrooms,
+                "Bathrooms": selected_bathrooms,
+            }
 
         st.subheader("Prediction Results")
 
         # Apply preprocessing to user input
         try:
-            processed_input = preprocessor.transform(user_input) # type: ignore
+            # Repeated inputs are served from the shared prediction cache
+            cached = prediction_cache.get(artifacts.version, user_input, interval_method) # type: ignore
+            if cached is not None:
+                predicted_price, lower_bound, upper_bound = cached
+            else:
+                processed_input = encoder.encode(user_input)[np.newaxis, :] # type: ignore
 
-            # Make prediction
-            log_prediction = model.predict(processed_input)
+                # Make prediction
+                log_prediction = model.predict(processed_input)
 
-            # Reverse the logarithmic transformation to get the actual price
-            predicted_price = round(np.exp(log_prediction[0]), -3)
+                # Reverse the logarithmic transformation to get the actual price
+                predicted_price = round(np.exp(log_prediction[0]), -3)
 
-            # Calculate prediction interval (95% confidence)
-            lower_log = log_prediction[0] - 1.96 * residual_std_log
-            upper_log = log_prediction[0] + 1.96 * residual_std_log
+                # Calculate prediction interval (95% confidence)
+                lower_log, upper_log = log_intervals(processed_input, log_prediction, residual_std_log, interval_method)
 
-            lower_bound = round(np.exp(lower_log), -3)
-            upper_bound = round(np.exp(upper_log), -3)
+                lower_bound = round(np.exp(lower_log[0]), -3)
+                upper_bound = round(np.exp(upper_log[0]), -3)
+
+                prediction_cache.put( # type: ignore
+                    artifacts.version, user_input, CachedPrediction(predicted_price, lower_bound, upper_bound),
+                    interval_method,
+                )
 
             # Format price range as a string
             price_range_str = f"KES {lower_bound:,.0f} - {upper_bound:,.0f}"
@@ -202,6 +321,16 @@ def home_page():
             st.success(f"Predicted Rent Price (KES): {predicted_price:,.0f}")
             st.info(f"Estimated Price Range (95% CI): KES {lower_bound:,.0f} - {upper_bound:,.0f}")
 
+            # Market context from the precomputed statistics cube
+            market = market_cube(reference).query(Sub_County=selected_sub_county, Neighborhood=selected_neighborhood)
+            if market["count"]:
+                st.caption(
+                    f"{selected_neighborhood}: {market['count']:,} listings, "
+                    + ("median" if market["quantiles_exact"] else "approximate median")
+                    + f" KES {market['median_price']:,.0f}"
+                    + (f", KES {market['price_per_sqm']:,.0f} per m²" if pd.notna(market["price_per_sqm"]) else "")
+                )
+
             # Store the prediction in Supabase
             user = st.session_state["user"]
             prediction_record = {
@@ -217,14 +346,10 @@ def home_page():
                 }
 
             try:
-                # Storing the prediction in Supabase database.
-                response = supabase.table("prediction").insert(prediction_record).execute()
-                  
-                if response.data:
-                    st.success("Prediction stored successfully!")
-                else:
-                    st.error("Failed to store the prediction in Supabase.")
-                    st.code(response, language="json")  # Display Supabase response for debugging
+                # Queue the prediction for the background writer; the page doesn't wait on Supabase
+                writer = get_prediction_writer()
+                ticket = writer.submit(prediction_record)
+                prediction_status(writer, ticket)
             except Exception as e:
                     st.error("An error occurred while storing the prediction.")
                     st.code(traceback.format_exc(), language="python")
@@ -238,9 +363,68 @@ def home_page():
         if "user" not in st.session_state:
             st.warning("Please log in to access the prediction form.")
 
+    # Keep the report open across reruns (filters, paging) until the next prediction
     if view_report:
+        st.session_state["show_report"] = True
+    elif submitted:
+        st.session_state["show_report"] = False
+
+    if st.session_state.get("show_report"):
         report.display_report()
 
+    # Batch valuation: score a whole CSV of properties at once
+    st.markdown("---")
+    st.subheader("Batch Valuation")
+    uploaded_file = st.file_uploader(
+        f"Upload a CSV with columns: {', '.join(FEATURE_COLUMNS)}", type="csv", key="batch_upload"
+    )
+
+    if uploaded_file is None:
+        st.session_state.pop("batch_scored", None)
+    else:
+        if "user" not in st.session_state:
+            st.warning("You need to log in to score a portfolio.")
+        else:
+            # Scored once per upload, model and interval method; reruns (form changes,
+            # the save button) reuse the scored rows and the CSV built from them
+            batch_key = (uploaded_file.file_id, artifacts.version, interval_method)
+            cached = st.session_state.get("batch_scored")
+            scored = None
+            if cached is not None and cached[0] == batch_key:
+                _, scored, scored_csv = cached
+            else:
+                st.session_state.pop("batch_scored", None)
+                try:
+                    batch = pd.read_csv(uploaded_file)
+                    with st.spinner(f"Scoring {len(batch):,} properties..."):
+                        scored = predict_batch(batch, artifacts, interval=interval_method)
+                        scored_csv = scored.to_csv(index=False).encode("utf-8")
+                except Exception as e:
+                    st.error(f"An error occurred while scoring the uploaded file: {e}")
+                    scored = None
+                else:
+                    st.session_state["batch_scored"] = (batch_key, scored, scored_csv)
+            if scored is not None:
+                st.dataframe(scored.head(50))
+                st.download_button(
+                    "Download Scored CSV",
+                    data=scored_csv,
+                    file_name="scored_properties.csv",
+                    mime="text/csv",
+                )
+
+                if st.button("Save predictions to my history"):
+                    try:
+                        records = prediction_records(scored, st.session_state["user"].uid)
+                        store = get_prediction_store()
+                        if store is None:
+                            raise ConnectionError("Prediction storage not available")
+                        stored = insert_predictions(store, records)
+                        st.success(f"{stored:,} predictions stored successfully!")
+                    except Exception as e:
+                        st.error("An error occurred while storing the predictions.")
+                        st.code(traceback.format_exc(), language="python")
+
     # Footer Section
     st.markdown("---")
     st.write("© 2025 Kelvin Njuguna | All rights reserved.")
\ No newline at end of file
@@ -7,9 +7,10 @@ import numpy as np
 import os
 import joblib
 from supabase import create_client, Client
-from io import StringIO
 from datetime import datetime
 import report
+from reference_data import load_reference_data
+from comparables import comparables_index, nearest_comparables
 
 load_dotenv()
 
@@ -97,21 +98,18 @@ def home_page():
     supabase: Client = create_client(url, key) # type: ignore
 
 
-    # Function to Read CSV from Supabase Storage
-    def read_csv_from_supabase(file_name):
-        file = supabase.storage.from_("RealEstateStorage").download(file_name)
-        # Convert the byte content to string, then use StringIO to read it as a CSV
-        file_str = file.decode("utf-8")  # Decode byte data to string
-        return pd.read_csv(StringIO(file_str))  # Use StringIO to read as CSV
-    
-    
     # Load model and preprocessor
     model = joblib.load("best_svm_model.pkl")
     preprocessor = joblib.load("pipeline.pkl")
 
 
-    # Read CSV from Supabase directly without downloading
-    data = read_csv_from_supabase("preprocessed.csv")
+    # Read CSV from Supabase (cached per reference-data version)
+    reference = load_reference_data(supabase, "preprocessed.csv")
+    data = reference.frame
+
+    # Exact-match and neighborhood lookups, built once per reference-data version
+    comparables = comparables_index(reference)
+    nearest = nearest_comparables(reference)
 
     # Prediction Section
     st.write("\n")
@@ -173,39 +171,24 @@ def home_page():
                 "Bathrooms": [selected_bathrooms],
             })
             
-            # Retrieve exact match rent price
-        actual_price = data[
-            (data["Sub_County"] == selected_sub_county) &
-            (data["Neighborhood"] == selected_neighborhood) &
-            (data["sq_mtrs"] == selected_square_mtrs) &
-            (data["Bedrooms"] == selected_bedrooms) &
-            (data["Bathrooms"] == selected_bathrooms)
-        ]["Price"].values  
+            # Retrieve exact match rent price (hash lookup, no scan of the frame)
+        actual_price = comparables.exact_price(
+            selected_sub_county, selected_neighborhood, selected_square_mtrs, selected_bedrooms, selected_bathrooms
+        )
 
         st.subheader("Prediction Results")
         
         # Checking for the actual price.
-        if len(actual_price) > 0:
-            actual_price = actual_price[0]
+        if actual_price is not None:
             st.success(f"**Exact Rent Price Found:** {actual_price:,} KES")
         else:
             st.warning("No exact actual price found. Displaying an approximate rent price.")
 
-            # Find similar properties
-            filtered_data = data[
-                (data["Sub_County"] == selected_sub_county) & 
-                (data["Neighborhood"] == selected_neighborhood)
-            ]
-            similar_properties = filtered_data[
-                (filtered_data["Bedrooms"] == selected_bedrooms) & 
-                (filtered_data["Bathrooms"] == selected_bathrooms)
-            ]
-
-            # Calculate estimated price
-            if not similar_properties.empty:
-                estimated_price = similar_properties["Price"].median()
-            else:
-                estimated_price = filtered_data["Price"].median()
+            # Estimated price from similar properties: precomputed median for the same rooms
+            # in the neighborhood, falling back to the whole neighborhood
+            estimated_price = comparables.estimate(
+                selected_sub_county, selected_neighborhood, selected_bedrooms, selected_bathrooms
+            )
 
             # **New Safe Handling for NaN values**
             if pd.isna(estimated_price):  
@@ -214,6 +197,14 @@ def home_page():
                 estimated_price = int(estimated_price)
                 st.info(f"**Average Rent Price Based on the Neighborhood :** {estimated_price:,} KES")
 
+            # Closest listings by size and rooms, within the neighborhood (or sub county)
+            nearest_listings = nearest.nearest(
+                selected_sub_county, selected_neighborhood, selected_square_mtrs, selected_bedrooms, selected_bathrooms
+            )
+            if not nearest_listings.empty:
+                with st.expander("Nearest comparable listings"):
+                    st.dataframe(nearest_listings, hide_index=True)
+
             # **Display predicted price (if available)**
             if "predicted_price" in locals() and predicted_price: # type: ignore
                 predicted_price = int(predicted_price)
@@ -0,0 +1,112 @@
+import argparse
+import csv
+import gzip
+import os
+import time
+
+from psycopg2 import sql
+
+from connection import get_database
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sql", "listings.sql")
+
+# Listing fields recognised in a file header (case-insensitive); others are ignored
+LISTING_FIELDS = ["sub_county", "neighborhood", "sq_mtrs", "bedrooms", "bathrooms", "price", "agency", "link"]
+REQUIRED_FIELDS = {"sub_county", "neighborhood", "price"}
+
+# Bytes per read while streaming a file into COPY
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# {field} placeholders are filled with the staging column holding that field, or null
+MERGE_SQL = sql.SQL("""
+insert into public.listings
+    (sub_county, neighborhood, sq_mtrs, bedrooms, bathrooms, price, agency, link, source, row_hash)
+select sub_county, neighborhood, sq_mtrs, bedrooms, bathrooms, price, agency, link, %(source)s,
+       public.listing_row_hash(sub_county, neighborhood, sq_mtrs, bedrooms, bathrooms, price)
+from (
+    select trim({sub_county}) as sub_county,
+           trim({neighborhood}) as neighborhood,
+           public.listing_number({sq_mtrs})::double precision as sq_mtrs,
+           round(public.listing_number({bedrooms}))::smallint as bedrooms,
+           round(public.listing_number({bathrooms}))::smallint as bathrooms,
+           round(public.listing_number({price}))::bigint as price,
+           nullif(trim({agency}), '') as agency,
+           nullif(trim({link}), '') as link
+    from pg_temp.listings_staging
+) cleaned
+where sub_county <> '' and neighborhood <> '' and price is not null
+on conflict (row_hash) do nothing
+""")
+
+
+def _open(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def ensure_schema(database) -> None:
+    with open(SCHEMA_PATH, "r", encoding="utf-8") as f:
+        ddl = f.read()
+    with database.connection() as conn, conn.cursor() as cur:
+        cur.execute(ddl)
+
+
+def ingest_file(database, path: str, source: str | None = None) -> dict:
+    """
+    Stream one listings CSV (optionally gzipped) into `listings`: COPY FROM STDIN into
+    a temporary all-text staging table, then one set-based merge that parses the
+    numbers, drops incomplete rows and skips listings already stored. The file is
+    read in COPY_BUFFER_SIZE pieces, so client memory doesn't grow with its size.
+    """
+    source = source or os.path.basename(path)
+    with _open(path) as f:
+        header = next(csv.reader([f.readline()]))
+        f.seek(0)
+        columns = [name.strip().lower() for name in header]
+        missing = REQUIRED_FIELDS - set(columns)
+        if missing:
+            raise ValueError(f"{path}: missing column(s) {', '.join(sorted(missing))}")
+
+        started = time.perf_counter()
+        with database.connection() as conn, conn.cursor() as cur:
+            # Loads can run far longer than the pool's default statement timeout
+            cur.execute("set local statement_timeout = 0")
+            staging_columns = sql.SQL(", ").join(
+                sql.SQL("{} text").format(sql.Identifier(f"_column_{i}")) for i in range(len(columns))
+            )
+            cur.execute(sql.SQL("create temp table listings_staging ({}) on commit drop").format(staging_columns))
+            cur.copy_expert("copy listings_staging from stdin with (format csv, header true)", f, size=COPY_BUFFER_SIZE)
+            staged = cur.rowcount
+
+            fields = {
+                field: sql.Identifier(f"_column_{columns.index(field)}") if field in columns else sql.SQL("null::text")
+                for field in LISTING_FIELDS
+            }
+            cur.execute(MERGE_SQL.format(**fields), {"source": source})
+            inserted = cur.rowcount
+
+    return {
+        "file": path,
+        "staged": staged,
+        "inserted": inserted,
+        "skipped": staged - inserted,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load listing CSV files into the Postgres `listings` table.")
+    parser.add_argument("paths", nargs="+", help="CSV files (.csv or .csv.gz) with a header row")
+    parser.add_argument("--source", help="Value stored in listings.source (default: the file name)")
+    args = parser.parse_args()
+
+    database = get_database()
+    if database is None:
+        raise SystemExit("Postgres credentials (user, password, host, port, dbname) are not set.")
+    ensure_schema(database)
+    for path in args.paths:
+        stats = ingest_file(database, path, args.source)
+        print(f"{stats['file']}: {stats['staged']:,} rows read, {stats['inserted']:,} new listings, "
+              f"{stats['skipped']:,} duplicate or incomplete, {stats['seconds']}s")
+    database.close()
@@ -0,0 +1,288 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from columnar_dataset import content_hash
+
+DIMENSIONS = ["Sub_County", "Neighborhood", "Bedrooms", "Bathrooms"]
+
+# Log-spaced price histogram shared by every cell: 256 bins from KES 1,000 to
+# KES 10,000,000 (each bin ~3.7% wide), so quantiles of any roll-up are within ~2%
+HIST_BINS = 256
+LOG_PRICE_MIN = np.log(1e3)
+LOG_PRICE_MAX = np.log(1e7)
+BIN_EDGES = np.linspace(LOG_PRICE_MIN, LOG_PRICE_MAX, HIST_BINS + 1)
+
+# Cells with at most this many listings also keep their raw prices, so quantiles
+# over few listings are exact instead of read off the histogram
+EXACT_QUANTILE_ROWS = 64
+
+CUBE_PATH = os.environ.get("MARKET_STATS_PATH", ".cache/market_stats.parquet")
+
+
+def _price_bins(prices: np.ndarray) -> np.ndarray:
+    bins = np.searchsorted(BIN_EDGES, np.log(np.maximum(prices, 1.0)), side="right") - 1
+    return np.clip(bins, 0, HIST_BINS - 1)
+
+
+def _quantile(hist: np.ndarray, q: float) -> float:
+    # Interpolate within the bin (on the log scale) where the cumulative count crosses q
+    total = hist.sum()
+    if total == 0:
+        return np.nan
+    cumulative = np.cumsum(hist)
+    target = q * total
+    b = int(np.searchsorted(cumulative, target, side="left"))
+    below = cumulative[b - 1] if b > 0 else 0
+    fraction = (target - below) / hist[b] if hist[b] else 0.5
+    return float(np.exp(BIN_EDGES[b] + fraction * (BIN_EDGES[b + 1] - BIN_EDGES[b])))
+
+
+def _merge_prices(prices, cell_ids: np.ndarray, counts: np.ndarray) -> list:
+    # Raw prices per merged cell; None once a cell holds more than EXACT_QUANTILE_ROWS
+    # listings (or any of its parts already did)
+    merged = [[] if count <= EXACT_QUANTILE_ROWS else None for count in counts]
+    for cell_id, part in zip(cell_ids, prices):
+        if merged[cell_id] is not None:
+            if part is None:
+                merged[cell_id] = None
+            else:
+                merged[cell_id].append(part)
+    return [None if parts is None else np.sort(np.concatenate(parts)) for parts in merged]
+
+
+class MarketCube:
+    """
+    Statistics cube over Sub_County x Neighborhood x Bedrooms x Bathrooms.
+
+    Each cell keeps only mergeable aggregates (count, price sum, price-per-m2 sum and
+    count, a log-price histogram, and the raw prices of cells with few listings), so
+    appending listings just adds to the affected cells, and any drill-down or roll-up
+    is a sum over cells without touching raw rows.
+
+    `source_rows` and `source_hash` identify the reference rows the cube was built
+    from, so a reference file that only grew can be folded in with append().
+    """
+
+    def __init__(self, cells: pd.DataFrame, hist: np.ndarray, version: str = "",
+                 source_rows: int = 0, source_hash: str = ""):
+        self.cells = cells.reset_index(drop=True)
+        self.hist = hist
+        self.version = version
+        self.source_rows = source_rows
+        self.source_hash = source_hash
+
+    @staticmethod
+    def _aggregate(rows: pd.DataFrame) -> tuple[pd.DataFrame, np.ndarray]:
+        rows = rows.dropna(subset=["Sub_County", "Neighborhood", "Price"])
+        prices = rows["Price"].to_numpy(dtype=np.float64)
+        sq_mtrs = rows["sq_mtrs"].to_numpy(dtype=np.float64)
+        valid_area = sq_mtrs > 0
+        frame = pd.DataFrame({
+            "Sub_County": rows["Sub_County"].to_numpy(),
+            "Neighborhood": rows["Neighborhood"].to_numpy(),
+            "Bedrooms": rows["Bedrooms"].to_numpy(dtype=np.float64),
+            "Bathrooms": rows["Bathrooms"].to_numpy(dtype=np.float64),
+            "count": 1,
+            "price_sum": prices,
+            "ppsm_sum": np.where(valid_area, prices / np.where(valid_area, sq_mtrs, 1.0), 0.0),
+            "ppsm_count": valid_area.astype(np.int64),
+            "bin": _price_bins(prices),
+        })
+        grouped = frame.groupby(DIMENSIONS, dropna=False, sort=True)
+        cells = grouped[["count", "price_sum", "ppsm_sum", "ppsm_count"]].sum().reset_index()
+
+        # Histogram rows line up with `cells` because both come from the same sorted groupby
+        cell_ids = grouped.ngroup().to_numpy()
+        hist = np.zeros((len(cells), HIST_BINS), dtype=np.int32)
+        np.add.at(hist, (cell_ids, frame["bin"].to_numpy()), 1)
+
+        counts = cells["count"].to_numpy()
+        by_cell = np.split(prices[np.argsort(cell_ids, kind="stable")], np.cumsum(counts)[:-1])
+        cells["prices"] = [np.sort(p) if len(p) <= EXACT_QUANTILE_ROWS else None for p in by_cell]
+        return cells, hist
+
+    @classmethod
+    def from_listings(cls, rows: pd.DataFrame, version: str = "", source_hash: str = "") -> "MarketCube":
+        cells, hist = cls._aggregate(rows)
+        return cls(cells, hist, version, len(rows), source_hash)
+
+    def append(self, rows: pd.DataFrame, version: str | None = None, source_hash: str = "") -> "MarketCube":
+        """
+        New cube with `rows` (new listings) folded in. Only the aggregates of the new
+        rows are computed; existing cells are merged by key, not rebuilt. `source_hash`
+        identifies the combined reference rows, if known.
+        """
+        new_cells, new_hist = self._aggregate(rows)
+        keys = pd.concat([self.cells[DIMENSIONS], new_cells[DIMENSIONS]], ignore_index=True)
+        cell_ids = keys.groupby(DIMENSIONS, dropna=False, sort=True).ngroup().to_numpy()
+        n_cells = int(cell_ids.max()) + 1 if len(cell_ids) else 0
+
+        measures = pd.concat([self.cells, new_cells], ignore_index=True)
+        cells = measures.groupby(cell_ids, sort=True).agg({
+            "Sub_County": "first", "Neighborhood": "first", "Bedrooms": "first", "Bathrooms": "first",
+            "count": "sum", "price_sum": "sum", "ppsm_sum": "sum", "ppsm_count": "sum",
+        })
+        cells["prices"] = _merge_prices(measures["prices"], cell_ids, cells["count"].to_numpy())
+        hist = np.zeros((n_cells, HIST_BINS), dtype=np.int32)
+        np.add.at(hist, cell_ids, np.vstack([self.hist, new_hist]))
+        return MarketCube(cells, hist, self.version if version is None else version,
+                          self.source_rows + len(rows), source_hash)
+
+    # --- queries ---
+    def _mask(self, filters: dict) -> np.ndarray:
+        mask = np.ones(len(self.cells), dtype=bool)
+        for column, value in filters.items():
+            if column not in DIMENSIONS:
+                raise ValueError(f"Unknown dimension: {column}")
+            if value is not None:
+                mask &= (self.cells[column] == value).to_numpy()
+        return mask
+
+    @staticmethod
+    def _summarize(count, price_sum, ppsm_sum, ppsm_count, hist, prices) -> dict:
+        # Quantiles come from the raw prices when every cell rolled up still has them
+        # and there are few enough of them; otherwise they're read off the histogram
+        exact = 0 < count <= EXACT_QUANTILE_ROWS and all(p is not None for p in prices)
+        if exact:
+            values = np.concatenate(list(prices))
+            q25, median, q75 = np.quantile(values, [0.25, 0.5, 0.75])
+        else:
+            q25, median, q75 = _quantile(hist, 0.25), _quantile(hist, 0.5), _quantile(hist, 0.75)
+        return {
+            "count": int(count),
+            "mean_price": price_sum / count if count else np.nan,
+            "median_price": float(median),
+            "q25_price": float(q25),
+            "q75_price": float(q75),
+            "quantiles_exact": bool(exact),
+            "price_per_sqm": ppsm_sum / ppsm_count if ppsm_count else np.nan,
+        }
+
+    def query(self, **filters) -> dict:
+        """
+        Roll-up over every dimension not given, e.g. query(Sub_County="Westlands").
+        """
+        mask = self._mask(filters)
+        cells = self.cells[mask]
+        return self._summarize(
+            cells["count"].sum(), cells["price_sum"].sum(), cells["ppsm_sum"].sum(),
+            cells["ppsm_count"].sum(), self.hist[mask].sum(axis=0), cells["prices"],
+        )
+
+    def drill_down(self, by, **filters) -> pd.DataFrame:
+        """
+        One row of statistics per value of the `by` dimension(s) within `filters`,
+        e.g. drill_down("Neighborhood", Sub_County="Westlands").
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        mask = self._mask(filters)
+        cells = self.cells[mask]
+        hist = self.hist[mask]
+        grouped = cells.groupby(by, dropna=False, sort=True)
+        group_ids = grouped.ngroup().to_numpy()
+        totals = grouped[["count", "price_sum", "ppsm_sum", "ppsm_count"]].sum()
+        group_hist = np.zeros((len(totals), HIST_BINS), dtype=np.int64)
+        np.add.at(group_hist, group_ids, hist)
+        group_prices = [[] for _ in range(len(totals))]
+        for group_id, prices in zip(group_ids, cells["prices"]):
+            group_prices[group_id].append(prices)
+
+        rows = [
+            self._summarize(c, p, s, n, h, q)
+            for c, p, s, n, h, q in zip(totals["count"], totals["price_sum"], totals["ppsm_sum"],
+                                        totals["ppsm_count"], group_hist, group_prices)
+        ]
+        return pd.concat([totals.index.to_frame(index=False), pd.DataFrame(rows)], axis=1)
+
+    # --- storage ---
+    def save(self, path: str = CUBE_PATH) -> None:
+        frame = self.cells.copy()
+        # Histograms are mostly empty, so store each as sparse (bin, count) lists
+        nonzero = [np.flatnonzero(row) for row in self.hist]
+        frame["hist_bins"] = [bins.astype(np.int16) for bins in nonzero]
+        frame["hist_counts"] = [row[bins] for row, bins in zip(self.hist, nonzero)]
+        frame.attrs["version"] = self.version
+        frame.attrs["source_rows"] = self.source_rows
+        frame.attrs["source_hash"] = self.source_hash
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        frame.to_parquet(path + ".tmp", index=False)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path: str = CUBE_PATH) -> "MarketCube":
+        frame = pd.read_parquet(path)
+        hist = np.zeros((len(frame), HIST_BINS), dtype=np.int32)
+        for i, (bins, counts) in enumerate(zip(frame["hist_bins"], frame["hist_counts"])):
+            hist[i, np.asarray(bins, dtype=np.intp)] = counts
+        cells = frame.drop(columns=["hist_bins", "hist_counts"])
+        cells["prices"] = [None if p is None else np.asarray(p, dtype=np.float64) for p in frame["prices"]]
+        return cls(cells, hist, frame.attrs.get("version", ""),
+                   int(frame.attrs.get("source_rows", 0)), frame.attrs.get("source_hash", ""))
+
+
+# Cube for the current reference-data version, shared across sessions
+_cube: MarketCube | None = None
+_lock = threading.Lock()
+
+
+def _refresh(cube: MarketCube | None, reference) -> MarketCube:
+    # A new version that only appended rows to the ones the cube was built from is
+    # folded in with append(); anything else (edits, deletions, reordering) rebuilds
+    frame = reference.frame
+    if cube is not None and cube.source_hash and 0 < cube.source_rows <= len(frame):
+        if content_hash(frame.iloc[:cube.source_rows]) == cube.source_hash:
+            return cube.append(frame.iloc[cube.source_rows:], reference.version, content_hash(frame))
+    return MarketCube.from_listings(frame, reference.version, content_hash(frame))
+
+
+def market_cube(reference) -> MarketCube:
+    """
+    Cube for a `reference_data.ReferenceData`. Loaded from CUBE_PATH when it was built
+    from the same version; otherwise updated with the appended rows (or rebuilt, if
+    the reference rows changed in any other way) once and saved.
+    """
+    global _cube
+    cube = _cube
+    if cube is not None and cube.version == reference.version:
+        return cube
+    with _lock:
+        if _cube is None or _cube.version != reference.version:
+            cube = _cube
+            if cube is None:
+                try:
+                    cube = MarketCube.load(CUBE_PATH)
+                except (OSError, ImportError, ValueError, KeyError):
+                    cube = None
+            if cube is None or cube.version != reference.version:
+                cube = _refresh(cube, reference)
+                try:
+                    cube.save(CUBE_PATH)
+                except (OSError, ImportError, ValueError):
+                    pass
+            _cube = cube
+        return _cube
+
+
+if __name__ == "__main__":
+    # Build the cube from the bundled dataset and compare a few figures to the raw rows
+    data = pd.read_csv("dataset/preprocessed_data.csv")
+    half = len(data) // 2
+    cube = MarketCube.from_listings(data.iloc[:half]).append(data.iloc[half:])
+    full = MarketCube.from_listings(data)
+    assert np.array_equal(cube.hist, full.hist), "incremental histograms differ"
+    assert cube.cells[DIMENSIONS + ["count", "ppsm_count"]].equals(full.cells[DIMENSIONS + ["count", "ppsm_count"]])
+    assert np.allclose(cube.cells[["price_sum", "ppsm_sum"]], full.cells[["price_sum", "ppsm_sum"]]), "incremental sums differ"
+    assert all((a is None and b is None) or np.array_equal(a, b) for a, b in zip(cube.cells["prices"], full.cells["prices"]))
+
+    area = data[data["Sub_County"] == "Westlands"]
+    stats = cube.query(Sub_County="Westlands")
+    print(f"Westlands listings: {stats['count']} (raw {len(area)})")
+    print(f"Westlands median:   {stats['median_price']:,.0f} (raw {area['Price'].median():,.0f})")
+    cell = cube.cells[cube.cells["count"] == 1].iloc[0]
+    single = data[(data["Sub_County"] == cell["Sub_County"]) & (data["Neighborhood"] == cell["Neighborhood"])]
+    stats = cube.query(Sub_County=cell["Sub_County"], Neighborhood=cell["Neighborhood"])
+    assert len(single) > EXACT_QUANTILE_ROWS or stats["median_price"] == single["Price"].median(), "small-cell median not exact"
+    print(cube.drill_down("Bedrooms", Sub_County="Westlands").round(0).to_string(index=False))
@@ -0,0 +1,87 @@
+import hashlib
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any
+
+import joblib
+
+# Artifacts used by the prediction form
+MODEL_PATH = "best_svm_model.pkl"
+PIPELINE_PATH = "pipeline.pkl"
+RESIDUAL_STD_PATH = "residual_std_log.pkl"
+
+
+@dataclass(frozen=True)
+class Artifact:
+    path: str
+    obj: Any
+    mtime_ns: int
+    size: int
+    sha256: str
+
+
+@dataclass(frozen=True)
+class ModelArtifacts:
+    model: Any
+    preprocessor: Any
+    residual_std_log: float
+    version: str
+
+
+# Process-wide registry shared by every Streamlit session
+_artifacts: dict[str, Artifact] = {}
+_lock = threading.Lock()
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def get_artifact(path: str) -> Artifact:
+    """
+    Return the unpickled artifact at `path`, loading it at most once per process.
+    The file is only re-read when its mtime/size changes, and only unpickled again
+    when its content hash differs from the cached copy.
+    """
+    stat = os.stat(path)
+    cached = _artifacts.get(path)
+    if cached is not None and cached.mtime_ns == stat.st_mtime_ns and cached.size == stat.st_size:
+        return cached
+
+    with _lock:
+        # Another session may have reloaded it while we waited for the lock
+        cached = _artifacts.get(path)
+        if cached is not None and cached.mtime_ns == stat.st_mtime_ns and cached.size == stat.st_size:
+            return cached
+
+        sha256 = _file_sha256(path)
+        if cached is not None and cached.sha256 == sha256:
+            # Touched but unchanged: keep the loaded object, refresh the stat
+            artifact = Artifact(path, cached.obj, stat.st_mtime_ns, stat.st_size, sha256)
+        else:
+            artifact = Artifact(path, joblib.load(path), stat.st_mtime_ns, stat.st_size, sha256)
+        _artifacts[path] = artifact
+        return artifact
+
+
+def get_model_artifacts() -> ModelArtifacts:
+    """
+    Model, preprocessor and residual std for the prediction form. `version` changes
+    whenever any of the three files changes, so it can be used as a cache key.
+    """
+    model = get_artifact(MODEL_PATH)
+    preprocessor = get_artifact(PIPELINE_PATH)
+    residual = get_artifact(RESIDUAL_STD_PATH)
+    version = hashlib.sha256(
+        (model.sha256 + preprocessor.sha256 + residual.sha256).encode("utf-8")
+    ).hexdigest()[:16]
+    return ModelArtifacts(model.obj, preprocessor.obj, float(residual.obj), version)
+
+
+def model_version() -> str:
+    return get_model_artifacts().version
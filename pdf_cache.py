@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+CACHE_DIR = os.environ.get("PDF_CACHE_DIR", ".cache/pdf")
+MAX_MEMORY_BYTES = int(os.environ.get("PDF_CACHE_MEMORY_BYTES", str(64 * 1024 * 1024)))
+MAX_DISK_BYTES = int(os.environ.get("PDF_CACHE_DISK_BYTES", str(512 * 1024 * 1024)))
+
+
+def report_key(df: pd.DataFrame, user_info: dict, template_version: str) -> str:
+    """
+    Content hash of the rows that go into a report, the user info printed on it and
+    the report template version.
+    """
+    digest = hashlib.sha256()
+    digest.update(template_version.encode("utf-8"))
+    digest.update(json.dumps(user_info, sort_keys=True, default=str).encode("utf-8"))
+    digest.update(json.dumps([str(c) for c in df.columns]).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def history_key(user_id: str, neighborhoods, row_count: int, newest, user_info: dict, template_version: str) -> str:
+    """
+    Key for a full-history report. Predictions are only ever appended, so the row
+    count and the newest row's (timestamp, id) identify the contents without reading them.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps(
+        ["history", template_version, user_id, sorted(neighborhoods or []), row_count, newest, user_info],
+        sort_keys=True, default=str,
+    ).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class PdfCache:
+    """
+    Rendered reports keyed by `report_key`, held in memory and on disk. Both tiers
+    evict least recently used documents once their total size exceeds the byte budget.
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR, max_memory_bytes: int = MAX_MEMORY_BYTES,
+                 max_disk_bytes: int = MAX_DISK_BYTES):
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pdf")
+
+    def _remember(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_memory_bytes:
+            return
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return
+            self._memory[key] = data
+            self._memory_bytes += len(data)
+            while self._memory_bytes > self.max_memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                return data
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+            os.utime(self._path(key))  # mark as recently used for disk eviction
+        except OSError:
+            return None
+        self._remember(key, data)
+        return data
+
+    def contains(self, key: str) -> bool:
+        with self._lock:
+            if key in self._memory:
+                return True
+        return os.path.exists(self._path(key))
+
+    def put(self, key: str, data: bytes) -> None:
+        self._remember(key, data)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(self._path(key) + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(self._path(key) + ".tmp", self._path(key))
+            self._evict_disk()
+        except OSError:
+            pass
+
+    def _evict_disk(self) -> None:
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith(".pdf"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def get_or_build(self, key: str, build) -> bytes:
+        """
+        Cached bytes for `key`, or the result of `build()` (which must return bytes).
+        """
+        data = self.get(key)
+        if data is None:
+            data = build()
+            self.put(key, data)
+        return data
+
+
+# Process-wide cache shared by every session
+pdf_cache = PdfCache()
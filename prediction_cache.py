@@ -0,0 +1,92 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+
+class CachedPrediction(NamedTuple):
+    predicted_price: float
+    lower_bound: float
+    upper_bound: float
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache with a TTL for single-row predictions, shared across sessions.
+
+    Entries are keyed on the normalized form inputs and interval method, plus the
+    model registry version. Seeing a new version drops every entry at once, so a
+    reloaded artifact never serves stale estimates.
+    """
+
+    def __init__(self, maxsize: int = 4096, ttl_seconds: float = 3600.0):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple, tuple[float, CachedPrediction]] = OrderedDict()
+        self._version: str | None = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(user_input: dict, interval: str = "residual") -> tuple:
+        return (
+            interval,
+            str(user_input["Sub_County"]).strip(),
+            str(user_input["Neighborhood"]).strip(),
+            int(user_input["sq_mtrs"]),
+            int(user_input["Bedrooms"]),
+            int(user_input["Bathrooms"]),
+        )
+
+    def _check_version(self, version: str) -> None:
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+
+    def get(self, version: str, user_input: dict, interval: str = "residual") -> CachedPrediction | None:
+        key = self.normalize(user_input, interval)
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, version: str, user_input: dict, prediction: CachedPrediction,
+            interval: str = "residual") -> None:
+        key = self.normalize(user_input, interval)
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = (time.monotonic(), prediction)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "version": self._version,
+            }
+
+
+# Process-wide cache used by the home page form
+prediction_cache = PredictionCache(
+    maxsize=int(os.environ.get("PREDICTION_CACHE_SIZE", "4096")),
+    ttl_seconds=float(os.environ.get("PREDICTION_CACHE_TTL", "3600")),
+)
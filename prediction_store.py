@@ -0,0 +1,230 @@
+import math
+import os
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+
+from supabase_client import get_supabase, supabase_call
+
+# Where prediction rows are written and read: "supabase" (PostgREST), "postgres"
+# (pooled direct connection, see connection.py) or "sqlite" (embedded local file)
+PREDICTION_BACKEND = os.environ.get("PREDICTION_BACKEND", "supabase")
+SQLITE_PATH = os.environ.get("PREDICTION_SQLITE_PATH", ".cache/predictions.sqlite3")
+
+
+class PredictionStore(ABC):
+    """
+    Storage for the `prediction` table. `insert_predictions` stores rows and returns
+    them as stored (with ids); `call` runs one of the report functions from
+    sql/report_functions.sql by name, with the same named parameters, and returns
+    its rows as dicts. connection.Database implements the same two methods.
+    """
+
+    @abstractmethod
+    def insert_predictions(self, records: list[dict]) -> list[dict]:
+        ...
+
+    @abstractmethod
+    def call(self, function: str, params: dict) -> list[dict]:
+        ...
+
+
+class SupabaseStore(PredictionStore):
+    def __init__(self, client):
+        self.client = client
+
+    def insert_predictions(self, records: list[dict]) -> list[dict]:
+        if not records:
+            return []
+        return supabase_call(self.client.table("prediction").insert(records).execute).data or []
+
+    def call(self, function: str, params: dict) -> list[dict]:
+        return supabase_call(self.client.rpc(function, params).execute).data or []
+
+
+class _StddevSamp:
+    # stddev_samp() aggregate for SQLite (Welford's online algorithm)
+    def __init__(self):
+        self.n, self.mean, self.m2 = 0, 0.0, 0.0
+
+    def step(self, value):
+        if value is not None:
+            self.n += 1
+            delta = value - self.mean
+            self.mean += delta / self.n
+            self.m2 += delta * (value - self.mean)
+
+    def finalize(self):
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else None
+
+
+SQLITE_SCHEMA = """
+create table if not exists prediction (
+    id integer primary key autoincrement,
+    user_id text not null,
+    sub_county text,
+    neighborhood text,
+    sq_mtrs real,
+    bedrooms integer,
+    bathrooms integer,
+    predicted_price real,
+    predicted_price_range text,
+    "timestamp" text not null default (strftime('%Y-%m-%dT%H:%M:%S', 'now'))
+);
+create index if not exists prediction_user_timestamp_idx on prediction (user_id, "timestamp" desc, id desc);
+create index if not exists prediction_user_id_idx on prediction (user_id, id);
+"""
+
+PREDICTION_COLUMNS = ["user_id", "sub_county", "neighborhood", "sq_mtrs", "bedrooms", "bathrooms",
+                      "predicted_price", "predicted_price_range", "timestamp"]
+
+
+class SQLiteStore(PredictionStore):
+    """
+    The `prediction` table and report functions in a local SQLite file, with the
+    same schema, indexes and results as the Postgres version, for offline use and
+    reproducible benchmarks. Each thread gets its own connection; WAL mode lets
+    readers run while the prediction writer inserts.
+    """
+
+    def __init__(self, path: str = SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        # Note that ":memory:" gives every thread its own empty database
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._connect().executescript(SQLITE_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("pragma journal_mode = wal")
+            conn.execute("pragma synchronous = normal")
+            conn.create_aggregate("stddev_samp", 1, _StddevSamp)
+            self._local.conn = conn
+        return conn
+
+    def insert_predictions(self, records: list[dict]) -> list[dict]:
+        if not records:
+            return []
+        rows = []
+        for record in records:
+            row = [record.get(column) for column in PREDICTION_COLUMNS]
+            # Same text form PostgREST returns, so keyset cursors compare the same way
+            row[-1] = str(row[-1]).replace(" ", "T") if row[-1] is not None else None
+            rows.append(row)
+        conn = self._connect()
+        columns = ", ".join(f'"{column}"' for column in PREDICTION_COLUMNS)
+        placeholders = ", ".join("?" * len(PREDICTION_COLUMNS))
+        # One transaction per batch; rows come back in insert order with their ids
+        with conn:
+            conn.execute("begin immediate")
+            stored = [
+                dict(conn.execute(
+                    f"insert into prediction ({columns}) values ({placeholders}) returning *", row
+                ).fetchone())
+                for row in rows
+            ]
+        # RETURNING can report whole REAL values as integers; match what a select returns
+        for row in stored:
+            for column in ("sq_mtrs", "predicted_price"):
+                if row[column] is not None:
+                    row[column] = float(row[column])
+        return stored
+
+    def call(self, function: str, params: dict) -> list[dict]:
+        user_id = params["p_user_id"]
+        neighborhoods = params.get("p_neighborhoods")
+        where, args = "user_id = ?", [user_id]
+        if neighborhoods:
+            where += f" and neighborhood in ({', '.join('?' * len(neighborhoods))})"
+            args += list(neighborhoods)
+
+        if function == "prediction_report_neighborhoods":
+            sql = ("select distinct neighborhood from prediction "
+                   "where user_id = ? and neighborhood is not null order by 1")
+            args = [user_id]
+        elif function == "prediction_report_summary":
+            sql = ("select count(*) as row_count, avg(predicted_price) as avg_price, "
+                   "min(predicted_price) as min_price, max(predicted_price) as max_price, "
+                   f"stddev_samp(predicted_price) as std_price from prediction where {where}")
+        elif function == "prediction_report_page":
+            if params.get("p_before_timestamp") is not None:
+                where += ' and ("timestamp", id) < (?, ?)'
+                args += [params["p_before_timestamp"], params["p_before_id"]]
+            sql = f'select * from prediction where {where} order by "timestamp" desc, id desc limit ?'
+            args.append(params.get("p_limit", 50))
+        elif function == "prediction_history_since":
+            sql = "select * from prediction where user_id = ? and id > ? order by id limit ?"
+            args = [user_id, params.get("p_after_id", 0), params.get("p_limit", 1000)]
+        else:
+            raise ValueError(f"Unknown report function: {function}")
+        return [dict(row) for row in self._connect().execute(sql, args)]
+
+
+# Process-wide store for the configured backend
+_store: PredictionStore | None = None
+_lock = threading.Lock()
+
+
+def get_prediction_store():
+    """
+    Store for PREDICTION_BACKEND, or None when that backend isn't configured
+    (missing Supabase or Postgres credentials).
+    """
+    global _store
+    if _store is None:
+        with _lock:
+            if _store is None:
+                if PREDICTION_BACKEND == "sqlite":
+                    _store = SQLiteStore(SQLITE_PATH)
+                elif PREDICTION_BACKEND == "postgres":
+                    from connection import Database, get_database
+
+                    # Implements the interface without importing this module
+                    PredictionStore.register(Database)
+                    _store = get_database()
+                elif PREDICTION_BACKEND == "supabase":
+                    client = get_supabase()
+                    _store = SupabaseStore(client) if client is not None else None
+                else:
+                    raise ValueError(f"Unknown PREDICTION_BACKEND: {PREDICTION_BACKEND}")
+    return _store
+
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    # Offline throughput of the SQLite backend: batched inserts as the prediction
+    # writer sends them, then keyset pages and summaries for individual users
+    users, per_user, batch = 200, 500, 100
+    with tempfile.TemporaryDirectory() as directory:
+        store = SQLiteStore(os.path.join(directory, "bench.sqlite3"))
+        records = [
+            {
+                "user_id": f"user-{i % users}", "sub_county": "Westlands", "neighborhood": f"N{i % 37}",
+                "sq_mtrs": 50 + i % 300, "bedrooms": 1 + i % 5, "bathrooms": 1 + i % 4,
+                "predicted_price": 40000.0 + 37 * i, "predicted_price_range": "",
+                "timestamp": f"2025-01-{1 + i // 40000:02d} {i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}",
+            }
+            for i in range(users * per_user)
+        ]
+        start = time.perf_counter()
+        for i in range(0, len(records), batch):
+            store.insert_predictions(records[i:i + batch])
+        elapsed = time.perf_counter() - start
+        print(f"insert:  {len(records):,} rows in batches of {batch}: {len(records) / elapsed:,.0f} rows/s")
+
+        for function, params in [
+            ("prediction_report_page", {"p_limit": 50}),
+            ("prediction_report_page", {"p_limit": 50, "p_neighborhoods": ["N1", "N2"]}),
+            ("prediction_report_summary", {}),
+        ]:
+            start = time.perf_counter()
+            for i in range(1000):
+                store.call(function, {"p_user_id": f"user-{i % users}", **params})
+            elapsed = time.perf_counter() - start
+            print(f"{function} {sorted(params)}: {elapsed:.3f} ms/call")
@@ -0,0 +1,265 @@
+import atexit
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from history_cache import history_cache
+from prediction_store import get_prediction_store
+
+# Where undeliverable records are appended until Supabase is reachable again
+SPOOL_PATH = os.environ.get("PREDICTION_SPOOL_PATH", ".cache/prediction_spool.jsonl")
+
+# Records the store rejected on their own (while other rows went in), kept for
+# inspection instead of being replayed forever
+DEAD_LETTER_PATH = os.environ.get("PREDICTION_DEAD_LETTER_PATH", ".cache/prediction_dead_letter.jsonl")
+
+# Replays (while other inserts succeed) after which a spooled record that still
+# fails is moved to the dead-letter file
+MAX_REPLAYS = int(os.environ.get("PREDICTION_MAX_REPLAYS", "5"))
+
+# Persistence states reported back to the UI
+QUEUED = "queued"
+STORED = "stored"
+SPOOLED = "spooled"
+REJECTED = "rejected"
+FAILED = "failed"
+
+
+class PredictionWriter:
+    """
+    Write-behind queue for rows of the Supabase `prediction` table.
+
+    `submit()` returns a ticket immediately; a background thread flushes queued
+    records as multi-row inserts once `batch_size` records are waiting or every
+    `flush_interval` seconds. Failed inserts are retried with exponential backoff,
+    then row by row: rows the store rejects while others go in are moved to a
+    dead-letter file, and if none go in (the store is down) the batch is appended to
+    a local spool file, which is replayed once inserts succeed.
+    """
+
+    def __init__(self, insert_batch, batch_size: int = 100, flush_interval: float = 1.0,
+                 max_queue: int = 10000, max_retries: int = 3, backoff: float = 0.5,
+                 spool_path: str = SPOOL_PATH, dead_letter_path: str = DEAD_LETTER_PATH,
+                 max_replays: int = MAX_REPLAYS):
+        self.insert_batch = insert_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.spool_path = spool_path
+        self.dead_letter_path = dead_letter_path
+        self.max_replays = max_replays
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._tickets = itertools.count(1)
+        # Tickets restart in every process; spooled entries remember which writer
+        # issued theirs, so a replay never updates the status of someone else's ticket
+        self._writer_id = uuid.uuid4().hex
+        self._status: OrderedDict[int, str] = OrderedDict()
+        self._status_lock = threading.Lock()
+        self._spool_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="prediction-writer", daemon=True)
+        self._thread.start()
+
+    # --- public API ---
+    def submit(self, record: dict) -> int:
+        ticket = next(self._tickets)
+        self._set_status(ticket, QUEUED)
+        try:
+            self._queue.put_nowait((ticket, record))
+        except queue.Full:
+            # Never block the page on a backed-up writer; keep the record on disk instead
+            self._spool([self._entry(ticket, record)])
+        return ticket
+
+    def status(self, ticket: int) -> str | None:
+        with self._status_lock:
+            return self._status.get(ticket)
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def close(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._thread.join(timeout)
+
+    # --- background thread ---
+    def _set_status(self, ticket: int, status: str) -> None:
+        with self._status_lock:
+            self._status[ticket] = status
+            self._status.move_to_end(ticket)
+            while len(self._status) > 10000:
+                self._status.popitem(last=False)
+
+    def _run(self) -> None:
+        pending: list[tuple[int, dict]] = []
+        deadline = time.monotonic() + self.flush_interval
+        while not self._stop.is_set() or not self._queue.empty():
+            try:
+                pending.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0.0)))
+            except queue.Empty:
+                pass
+
+            if len(pending) >= self.batch_size or time.monotonic() >= deadline or self._stop.is_set():
+                if pending:
+                    self._flush(pending)
+                    pending = []
+                elif os.path.exists(self.spool_path):
+                    self._replay_spool()
+                deadline = time.monotonic() + self.flush_interval
+        if pending:
+            self._flush(pending)
+
+    def _insert_with_retry(self, records: list[dict]) -> bool:
+        for attempt in range(self.max_retries):
+            try:
+                self.insert_batch(records)
+                return True
+            except Exception:
+                if attempt + 1 < self.max_retries and not self._stop.is_set():
+                    time.sleep(self.backoff * (2 ** attempt))
+        return False
+
+    def _entry(self, ticket: int, record: dict) -> dict:
+        # A spool entry; `id` is unique across processes, `attempts` counts replays
+        # that failed while the store was up
+        return {"id": uuid.uuid4().hex, "writer": self._writer_id, "ticket": ticket, "record": record, "attempts": 0}
+
+    def _mark(self, entries: list[dict], status: str) -> None:
+        for entry in entries:
+            if entry.get("writer") == self._writer_id:
+                self._set_status(entry["ticket"], status)
+
+    def _insert_each(self, entries: list[dict]) -> list[dict]:
+        # One insert per row, so a row the store rejects can't take the others down
+        # with it; returns the entries that failed
+        failed = []
+        for entry in entries:
+            try:
+                self.insert_batch([entry["record"]])
+            except Exception:
+                failed.append(entry)
+            else:
+                self._mark([entry], STORED)
+        return failed
+
+    def _flush(self, pending: list[tuple[int, dict]]) -> None:
+        if self._insert_with_retry([record for _, record in pending]):
+            for ticket, _ in pending:
+                self._set_status(ticket, STORED)
+        else:
+            entries = [self._entry(ticket, record) for ticket, record in pending]
+            failed = self._insert_each(entries) if len(entries) > 1 else entries
+            if len(failed) == len(entries):
+                # Nothing went in: most likely the store is down
+                self._spool(entries)
+                return
+            self._dead_letter(failed)
+        # Supabase is reachable again: push anything spooled while it was down
+        if os.path.exists(self.spool_path):
+            self._replay_spool(store_up=True)
+
+    def _append(self, path: str, lines: list[dict]) -> None:
+        if not lines:
+            return
+        with self._spool_lock:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                for line in lines:
+                    f.write(json.dumps(line) + "\n")
+
+    def _spool(self, entries: list[dict]) -> None:
+        try:
+            self._append(self.spool_path, entries)
+            status = SPOOLED
+        except OSError:
+            status = FAILED
+        self._mark(entries, status)
+
+    def _dead_letter(self, entries: list[dict]) -> None:
+        try:
+            self._append(self.dead_letter_path, [{**entry, "rejected_at": time.time()} for entry in entries])
+        except OSError:
+            pass
+        self._mark(entries, REJECTED)
+
+    def _replay_spool(self, store_up: bool = False) -> None:
+        """
+        Insert the spooled records. `store_up` says an insert just succeeded, so rows
+        that fail now are being rejected rather than hitting an outage.
+        """
+        replay_path = self.spool_path + ".replay"
+        with self._spool_lock:
+            # A leftover replay file means a previous replay was interrupted; retry it first
+            if not os.path.exists(replay_path):
+                try:
+                    os.replace(self.spool_path, replay_path)
+                except OSError:
+                    return
+
+        with open(replay_path, "r", encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+        for entry in entries:
+            # Entries spooled before ids and attempts were recorded
+            entry.setdefault("id", uuid.uuid4().hex)
+            entry.setdefault("attempts", 0)
+
+        for start in range(0, len(entries), self.batch_size):
+            batch = entries[start:start + self.batch_size]
+            try:
+                self.insert_batch([entry["record"] for entry in batch])
+            except Exception:
+                failed = self._insert_each(batch)
+                if len(failed) < len(batch):
+                    # Other rows went in, so the store is up and these were rejected
+                    self._dead_letter(failed)
+                    store_up = True
+                    continue
+                # Nothing went in. If the store was known to be up, these rows count an
+                # attempt and go back on the spool while the replay carries on; a second
+                # such batch in a row (or one while the store's state is unknown) looks
+                # like an outage, so it and the untried rest are spooled uncounted and
+                # retried later. Rows only leave the spool stored or dead-lettered.
+                if store_up:
+                    for entry in batch:
+                        entry["attempts"] += 1
+                    self._dead_letter([entry for entry in batch if entry["attempts"] >= self.max_replays])
+                    self._spool([entry for entry in batch if entry["attempts"] < self.max_replays])
+                    store_up = False
+                    continue
+                self._spool(entries[start:])
+                break
+            store_up = True
+            self._mark(batch, STORED)
+        os.remove(replay_path)
+
+
+# Process-wide writer shared by every session
+_writer: PredictionWriter | None = None
+_writer_lock = threading.Lock()
+
+
+def _insert_batch(records: list[dict]) -> None:
+    store = get_prediction_store()
+    if store is None:
+        raise ConnectionError("Prediction storage not available")
+    stored = store.insert_predictions(records)
+    if not stored:
+        raise RuntimeError("No rows returned for the prediction insert")
+    # The returned rows carry their ids, so cached report histories can take them as-is
+    history_cache.add_stored(stored)
+
+
+def get_prediction_writer() -> PredictionWriter:
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = PredictionWriter(_insert_batch)
+                atexit.register(_writer.close)
+    return _writer
@@ -0,0 +1,115 @@
+import threading
+
+import numpy as np
+
+from model_registry import get_artifact
+
+QUANTILE_MODELS_PATH = "quantile_models.pkl"
+
+# Interval methods selectable per request
+RESIDUAL = "residual"
+QUANTILE = "quantile"
+
+# z-score of the 95% interval used with the SVR residual std
+Z_95 = 1.96
+
+
+class QuantileIntervalEngine:
+    """
+    LightGBM quantile regressors (alpha 0.025, 0.5, 0.975) from quantile_models.pkl,
+    evaluated together on one encoded input. They were trained on log price with the
+    same preprocessing as the SVR, so they take the CompiledEncoder output directly.
+    """
+
+    def __init__(self, models: dict):
+        self.alphas = sorted(models)
+        if len(self.alphas) < 2:
+            raise ValueError("Need at least a lower and an upper quantile model")
+        self.boosters = [models[alpha].booster_ for alpha in self.alphas]
+
+    def predict_quantiles(self, X) -> np.ndarray:
+        """
+        (n_rows, n_quantiles) log-price quantiles, sorted along each row so the
+        bounds never cross.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        quantiles = np.empty((X.shape[0], len(self.boosters)), dtype=np.float64)
+        for j, booster in enumerate(self.boosters):
+            quantiles[:, j] = booster.predict(X, num_threads=1)
+        quantiles.sort(axis=1)
+        return quantiles
+
+
+# Engine for the current quantile_models.pkl, keyed by its content hash
+_engine: tuple[str, QuantileIntervalEngine] | None = None
+_lock = threading.Lock()
+
+
+def quantile_engine() -> QuantileIntervalEngine:
+    global _engine
+    artifact = get_artifact(QUANTILE_MODELS_PATH)
+    engine = _engine
+    if engine is not None and engine[0] == artifact.sha256:
+        return engine[1]
+    with _lock:
+        if _engine is None or _engine[0] != artifact.sha256:
+            _engine = (artifact.sha256, QuantileIntervalEngine(artifact.obj))
+        return _engine[1]
+
+
+def log_intervals(X, log_prediction, residual_std_log: float, method: str = RESIDUAL):
+    """
+    95% (lower, upper) bounds on the log scale for the rows of encoded input `X`.
+
+    RESIDUAL gives every property the same width, log_prediction +/- 1.96 * residual std.
+    QUANTILE uses the LightGBM 2.5% / 97.5% quantiles, widened if needed so the SVR
+    point estimate always lies inside the interval.
+    """
+    log_prediction = np.asarray(log_prediction, dtype=np.float64)
+    if method == RESIDUAL:
+        margin = Z_95 * residual_std_log
+        return log_prediction - margin, log_prediction + margin
+    if method == QUANTILE:
+        quantiles = quantile_engine().predict_quantiles(X)
+        return np.minimum(quantiles[:, 0], log_prediction), np.maximum(quantiles[:, -1], log_prediction)
+    raise ValueError(f"Unknown interval method: {method!r}")
+
+
+if __name__ == "__main__":
+    # Latency and interval width of the residual and quantile approaches
+    import timeit
+
+    import pandas as pd
+
+    from fast_encoder import compiled_encoder
+    from model_registry import get_model_artifacts
+    from svr_engine import svr_engine
+
+    artifacts = get_model_artifacts()
+    encoder = compiled_encoder(artifacts)
+    engine = svr_engine(artifacts)
+
+    data = pd.read_csv("dataset/preprocessed_data.csv")
+    X = encoder.encode_frame(data)
+    log_prediction = engine.predict(X)
+    actual = np.log(data["Price"].to_numpy(dtype=np.float64))
+
+    for method in (RESIDUAL, QUANTILE):
+        log_intervals(X[:1], log_prediction[:1], artifacts.residual_std_log, method)  # warm up
+        n = 500
+        single = timeit.timeit(
+            lambda: log_intervals(X[:1], log_prediction[:1], artifacts.residual_std_log, method), number=n
+        ) / n
+        batch = timeit.timeit(
+            lambda: log_intervals(X, log_prediction, artifacts.residual_std_log, method), number=5
+        ) / 5
+        lower, upper = log_intervals(X, log_prediction, artifacts.residual_std_log, method)
+        width = np.exp(upper) - np.exp(lower)
+        coverage = np.mean((actual >= lower) & (actual <= upper))
+        print(
+            f"{method:>8}: single {single * 1e6:9.1f} us  batch {batch * 1e3:7.1f} ms/{len(X)} rows  "
+            f"median width KES {np.median(width):>9,.0f}  width IQR KES {np.subtract(*np.percentile(width, [75, 25])):>9,.0f}  "
+            f"coverage {coverage:.1%}"
+        )
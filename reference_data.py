@@ -0,0 +1,173 @@
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from io import BytesIO
+
+import pandas as pd
+
+from columnar_dataset import content_hash, normalize_frame, read_dataset, write_dataset
+from supabase_client import supabase_call
+
+# Supabase storage bucket holding the reference CSVs
+REFERENCE_BUCKET = "RealEstateStorage"
+
+# Local copy used when storage is unreachable and nothing is cached yet; a columnar
+# copy made with `python columnar_dataset.py dataset/preprocessed_data.csv` is preferred
+LOCAL_FALLBACK_PATH = "dataset/preprocessed_data.csv"
+LOCAL_FALLBACK_COLUMNAR_PATH = "dataset/preprocessed_data.arrow"
+
+# On-disk columnar cache (memory-mapped Arrow IPC) and how long a copy is trusted before revalidating
+CACHE_DIR = os.environ.get("REFERENCE_CACHE_DIR", ".cache/reference")
+CACHE_TTL_SECONDS = float(os.environ.get("REFERENCE_DATA_TTL", "900"))
+
+
+@dataclass(frozen=True)
+class ReferenceData:
+    frame: pd.DataFrame
+    version: str
+    checked_at: float
+
+
+# Parsed frames shared across sessions, keyed by file name
+_entries: dict[str, ReferenceData] = {}
+_lock = threading.Lock()
+
+
+def _cache_paths(file_name: str) -> tuple[str, str]:
+    stem = os.path.splitext(os.path.basename(file_name))[0]
+    return os.path.join(CACHE_DIR, f"{stem}.arrow"), os.path.join(CACHE_DIR, f"{stem}.json")
+
+
+def _remote_version(supabase, file_name: str) -> str:
+    """
+    ETag (or last-modified time) of the object in the bucket, without downloading it.
+    """
+    folder, _, name = file_name.rpartition("/")
+    objects = supabase_call(supabase.storage.from_(REFERENCE_BUCKET).list, folder or None, {"search": name})
+    for obj in objects or []:
+        if obj.get("name") == name:
+            metadata = obj.get("metadata") or {}
+            version = metadata.get("eTag") or obj.get("updated_at") or metadata.get("lastModified")
+            if version:
+                return str(version).strip('"')
+    raise FileNotFoundError(f"{file_name} not found in bucket {REFERENCE_BUCKET}")
+
+
+def _read_disk_cache(file_name: str) -> ReferenceData | None:
+    data_path, meta_path = _cache_paths(file_name)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        frame = read_dataset(data_path)
+        return ReferenceData(frame, meta["version"], float(meta["checked_at"]))
+    except (OSError, ImportError, KeyError, ValueError):
+        return None
+
+
+def _write_disk_cache(file_name: str, entry: ReferenceData) -> None:
+    data_path, meta_path = _cache_paths(file_name)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Data before metadata: both are renamed into place, so a reader that finds the
+        # new version in the metadata also finds its data
+        write_dataset(entry.frame, data_path)
+        _touch_disk_cache(file_name, entry.version, entry.checked_at)
+    except (OSError, ImportError, ValueError):
+        # The disk copy is an optimisation only; the in-memory copy is still valid
+        pass
+
+
+def _touch_disk_cache(file_name: str, version: str, checked_at: float) -> None:
+    _, meta_path = _cache_paths(file_name)
+    try:
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"version": version, "checked_at": checked_at}, f)
+        os.replace(meta_path + ".tmp", meta_path)
+    except OSError:
+        pass
+
+
+def _read_local_fallback() -> ReferenceData:
+    try:
+        # Skip a columnar copy older than the CSV it was made from
+        if os.stat(LOCAL_FALLBACK_COLUMNAR_PATH).st_mtime >= os.stat(LOCAL_FALLBACK_PATH).st_mtime:
+            frame = read_dataset(LOCAL_FALLBACK_COLUMNAR_PATH)
+            return ReferenceData(frame, f"local-{frame.attrs['content_hash'][:16]}", time.time())
+    except (OSError, ImportError, ValueError):
+        pass
+    frame = normalize_frame(pd.read_csv(LOCAL_FALLBACK_PATH))
+    return ReferenceData(frame, f"local-{content_hash(frame)[:16]}", time.time())
+
+
+def _download(supabase, file_name: str, version: str) -> ReferenceData:
+    file = supabase_call(supabase.storage.from_(REFERENCE_BUCKET).download, file_name)
+    return ReferenceData(normalize_frame(pd.read_csv(BytesIO(file))), version, time.time())
+
+
+def load_reference_data(supabase, file_name: str = "preprocessed.csv") -> ReferenceData:
+    """
+    Return the reference dataset as a parsed DataFrame plus its version, with the
+    compact column types of columnar_dataset.normalize_frame.
+
+    The frame is kept in process memory and persisted as Arrow IPC under CACHE_DIR.
+    The bucket is only revalidated (a metadata call, not a download) once the cached
+    copy is older than CACHE_TTL_SECONDS, and re-downloaded only when its ETag changed.
+    If storage is unreachable the last cached copy is served, or the bundled CSV.
+    """
+    now = time.time()
+    entry = _entries.get(file_name)
+    if entry is not None and now - entry.checked_at < CACHE_TTL_SECONDS:
+        return entry
+
+    with _lock:
+        entry = _entries.get(file_name)
+        if entry is not None and now - entry.checked_at < CACHE_TTL_SECONDS:
+            return entry
+
+        # Cold process: a fresh enough disk copy avoids the network entirely
+        if entry is None:
+            entry = _read_disk_cache(file_name)
+            if entry is not None and now - entry.checked_at < CACHE_TTL_SECONDS:
+                _entries[file_name] = entry
+                return entry
+
+        try:
+            if supabase is None:
+                raise ConnectionError("Supabase client not available")
+            version = _remote_version(supabase, file_name)
+        except Exception:
+            # Offline: keep serving whatever we have, and retry after another TTL
+            if entry is None:
+                entry = _read_local_fallback()
+            entry = ReferenceData(entry.frame, entry.version, now)
+            _entries[file_name] = entry
+            return entry
+
+        if entry is not None and entry.version == version:
+            entry = ReferenceData(entry.frame, version, now)
+            _touch_disk_cache(file_name, version, now)
+        else:
+            try:
+                entry = _download(supabase, file_name, version)
+                _write_disk_cache(file_name, entry)
+            except Exception:
+                if entry is None:
+                    entry = _read_local_fallback()
+                entry = ReferenceData(entry.frame, entry.version, now)
+
+        _entries[file_name] = entry
+        return entry
+
+
+def invalidate(file_name: str | None = None) -> None:
+    """
+    Force the next load to revalidate against the bucket.
+    """
+    with _lock:
+        names = list(_entries) if file_name is None else [file_name]
+        for name in names:
+            entry = _entries.get(name)
+            if entry is not None:
+                _entries[name] = ReferenceData(entry.frame, entry.version, 0.0)
@@ -1,164 +1,25 @@
-from datetime import datetime
-import numpy as np
 import pandas as pd
-import os
-from io import BytesIO, StringIO
 
 import streamlit as st
-from supabase import create_client, Client  # type: ignore
 
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image as RLImage, Table, TableStyle
-
-# --- Supabase init (validate env) ---
-SUPABASE_URL = os.environ.get("supabase_url")
-SUPABASE_KEY = os.environ.get("supabase_key")
-
-if not SUPABASE_URL or not SUPABASE_KEY:
-    st.error("Supabase credentials not found in environment variables.")
-
-supabase: Client | None = None
+from prediction_store import PredictionStore, get_prediction_store
+from history_cache import history_cache
+from pdf_cache import history_key, pdf_cache, report_key
+from report_export import EXPORT_FORMATS, ExportFile, export_history_file
+from report_format import format_price_ranges
+from report_jobs import DONE, FAILED, ReportQueueFull, report_jobs
+from report_pdf import HISTORY_ROWS_PER_PAGE, REPORT_TEMPLATE_VERSION
+from report_queries import PAGE_SIZE
+
+# --- Prediction store init (Supabase by default, see PREDICTION_BACKEND) ---
+store: PredictionStore | None = None
 try:
-    if SUPABASE_URL and SUPABASE_KEY:
-        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)  # type: ignore
+    store = get_prediction_store()
+    if store is None:
+        st.error("Prediction storage is not configured. Check environment variables.")
 except Exception as e:
-    st.error(f"Failed initializing Supabase client: {e}")
-    supabase = None
-
-
-# --- PDF Builder (no charts) ---
-def build_pdf(df: pd.DataFrame, user_info: dict, logo_path: str = "./img/Logo1.png") -> BytesIO:
-    """
-    Build a multi-section PDF using reportlab.platypus and return BytesIO buffer.
-    """
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(
-        buffer, pagesize=letter,
-        rightMargin=36, leftMargin=36, topMargin=36, bottomMargin=36
-    )
-    styles = getSampleStyleSheet()
-    story = []
-
-    # Cover
-    title_style = styles["Title"]
-    normal = styles["BodyText"]
-    small = ParagraphStyle("small", parent=styles["Normal"], fontSize=9)
-
-    # Logo (optional)
-    try:
-        if os.path.exists(logo_path):
-            story.append(RLImage(logo_path, width=150, height=75))
-    except Exception:
-        pass
-
-    story.append(Spacer(1, 12))
-    story.append(Paragraph("PREDICTION REPORT", title_style))
-    story.append(Spacer(1, 6))
-    story.append(
-        Paragraph(
-            f"Generated for <b>{user_info.get('name','N/A')}</b> ({user_info.get('email','N/A')}) "
-            f"on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}.",
-            normal,
-        )
-    )
-    story.append(Spacer(1, 12))
-    story.append(
-        Paragraph(
-            "This report provides an overview of predicted housing prices from your recent queries. "
-            "It includes summary statistics and a preview of the predictions.",
-            normal,
-        )
-    )
-    story.append(Spacer(1, 18))
-
-    # Summary Stats
-    story.append(Paragraph("Summary Statistics", styles["Heading2"]))
-    stats_data = []
-    def fmt(x): return f"{x:,.0f}" if pd.notna(x) else "N/A"
-    avg_price = df["predicted_price"].mean() if not df["predicted_price"].empty else np.nan
-    min_price = df["predicted_price"].min() if not df["predicted_price"].empty else np.nan
-    max_price = df["predicted_price"].max() if not df["predicted_price"].empty else np.nan
-    std_price = df["predicted_price"].std() if not df["predicted_price"].empty else np.nan
-
-    stats_data.append(["Average Predicted Price:", fmt(avg_price)])
-    stats_data.append(["Minimum Predicted Price:", fmt(min_price)])
-    stats_data.append(["Maximum Predicted Price:", fmt(max_price)])
-    stats_data.append(["Std Dev of Predicted Price:", fmt(std_price)])
-
-    t = Table(stats_data, colWidths=[250, 200])
-    t.setStyle(
-        TableStyle(
-            [
-                ("BACKGROUND", (0, 0), (-1, 0), colors.whitesmoke),
-                ("FONTNAME", (0, 0), (-1, -1), "Helvetica"),
-                ("FONTSIZE", (0, 0), (-1, -1), 10),
-                ("LINEBELOW", (0, 0), (-1, -1), 0.25, colors.grey),
-            ]
-        )
-    )
-    story.append(t)
-    story.append(Spacer(1, 12))
-
-    # Preview Table (first 10 rows with predicted price range)
-    story.append(Paragraph("Predictions Preview (first 10 rows)", styles["Heading2"]))
-    preview = df.head(10).copy()
-    if not preview.empty:
-        preview["predicted_price_range"] = preview["predicted_price"].apply(
-            lambda x: f"{max(x-50000,0):,.0f} - {x+50000:,.0f}" if pd.notna(x) else "N/A"
-        )
-
-    cols_to_show = ["sub_county", "neighborhood", "sq_mtrs", "bedrooms", "bathrooms", "predicted_price", "predicted_price_range"]
-    cols = [c for c in cols_to_show if c in preview.columns]
-
-    if preview.empty:
-        story.append(Paragraph("No data to display.", normal))
-    else:
-        table_data = [cols]
-        for _, row in preview[cols].iterrows():
-            line = []
-            for c in cols:
-                val = row[c]
-                if pd.isna(val):
-                    line.append("")
-                elif c in ["predicted_price"]:
-                    line.append(f"{val:,.0f}")
-                else:
-                    line.append(str(val))
-            table_data.append(line)
-
-        tbl = Table(table_data, repeatRows=1, colWidths=[80] * len(cols))
-        tbl.setStyle(
-            TableStyle(
-                [
-                    ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#f2f2f2")),
-                    ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
-                    ("FONTNAME", (0, 0), (-1, -1), "Helvetica"),
-                    ("FONTSIZE", (0, 0), (-1, -1), 9),
-                ]
-            )
-        )
-        story.append(tbl)
-
-    story.append(Spacer(1, 18))
-
-    # Disclaimer & Footer
-    story.append(Paragraph("Notes", styles["Heading2"]))
-    story.append(
-        Paragraph(
-            "These predictions are generated by a statistical model and should be used for informational purposes only. "
-            "They are estimates and may not reflect actual market prices. Use additional sources when making financial decisions.",
-            normal,
-        )
-    )
-    story.append(Spacer(1, 12))
-    story.append(Paragraph(f"© {datetime.now().year} Kelvin Njuguna | All rights reserved.", small))
-
-    # Build document
-    doc.build(story)
-    buffer.seek(0)
-    return buffer
+    st.error(f"Failed initializing prediction storage: {e}")
+    store = None
 
 
 # --- Main display_report function (no charts) ---
@@ -167,8 +28,8 @@ def display_report():
         st.warning("You need to log in to access the report.")
         return
 
-    if supabase is None:
-        st.error("Supabase client not initialized. Check environment variables.")
+    if store is None:
+        st.error("Prediction storage not initialized. Check environment variables.")
         return
 
     user = st.session_state["user"]
@@ -184,66 +45,180 @@ def display_report():
     st.title("Prediction Report")
     st.write(f"Logged in as: **{user_name}** ({user_email})")
 
-    # Fetch predictions
+    # The user's history from the in-process cache (only rows added since the last view
+    # are fetched), or store-side queries when the history is too large to cache
     try:
-        res = supabase.table("prediction").select("*").eq("user_id", user_uid).execute()
+        source = history_cache.report_source(store, user_uid)
+        neighborhoods = source.neighborhoods()
     except Exception as e:
-        st.error(f"Error fetching data from Supabase: {e}")
+        st.error(f"Error fetching predictions: {e}")
+        st.caption("The report needs the functions in sql/report_functions.sql to be installed.")
         return
 
-    if not res.data:
-        st.warning("No prediction data found for the logged-in user.")
-        return
+    # Filters
+    st.sidebar.header("Filters")
+    chosen_nbh = st.sidebar.multiselect("Neighborhood", options=neighborhoods, default=neighborhoods[:5])
 
+    # Summary metrics over the filtered rows
     try:
-        df = pd.DataFrame(res.data)
+        summary = source.summary(chosen_nbh)
     except Exception as e:
-        st.error(f"Failed to convert prediction data to DataFrame: {e}")
+        st.error(f"Error fetching predictions: {e}")
         return
 
-    if "predicted_price" not in df.columns:
-        st.error("Prediction data does not contain 'predicted_price' column.")
+    if summary.count == 0:
+        st.warning("No prediction data found for the logged-in user.")
         return
 
-    # cast numeric
-    df["predicted_price"] = pd.to_numeric(df["predicted_price"], errors="coerce")
-
-    # Filters
-    st.sidebar.header("Filters")
-    if "neighborhood" in df.columns:
-        neighborhoods = sorted(df["neighborhood"].dropna().unique().tolist())
-        chosen_nbh = st.sidebar.multiselect("Neighborhood", options=neighborhoods, default=neighborhoods[:5])
-        if chosen_nbh:
-            df = df[df["neighborhood"].isin(chosen_nbh)]
-
-    # Summary metrics
+    def fmt(x): return f"{x:,.0f}" if pd.notna(x) else "N/A"
     st.subheader("Summary Metrics")
     col1, col2, col3 = st.columns(3)
-    col1.metric("Average Predicted", f"{df['predicted_price'].mean():,.0f}")
-    col2.metric("Min Predicted", f"{df['predicted_price'].min():,.0f}")
-    col3.metric("Max Predicted", f"{df['predicted_price'].max():,.0f}")
+    col1.metric("Average Predicted", fmt(summary.avg_price))
+    col2.metric("Min Predicted", fmt(summary.min_price))
+    col3.metric("Max Predicted", fmt(summary.max_price))
 
-    # Table preview (with range)
+    # Table preview (with range): one page at a time, keyset-paginated on (timestamp, id)
     st.subheader("Predictions Preview")
-    if not df.empty:
-        df_preview = df.head(50).copy()
-        df_preview["predicted_price_range"] = df_preview["predicted_price"].apply(
-            lambda x: f"{max(x-50000,0):,.0f} - {x+50000:,.0f}" if pd.notna(x) else "N/A"
-        )
+    filter_key = (user_uid, tuple(chosen_nbh))
+    if st.session_state.get("report_page_filters") != filter_key:
+        st.session_state["report_page_filters"] = filter_key
+        st.session_state["report_page_cursors"] = [None]
+    cursors = st.session_state["report_page_cursors"]
+
+    try:
+        df_preview, next_cursor = source.page(chosen_nbh, cursors[-1], PAGE_SIZE)
+    except Exception as e:
+        st.error(f"Error fetching predictions: {e}")
+        return
+
+    if not df_preview.empty:
+        df_preview["predicted_price"] = pd.to_numeric(df_preview["predicted_price"], errors="coerce")
+        df_preview["predicted_price_range"] = format_price_ranges(df_preview["predicted_price"])
         st.dataframe(df_preview)
     else:
         st.write("No data to display.")
 
-    # Download CSV
-    csv_buffer = StringIO()
-    df.to_csv(csv_buffer, index=False)
-    csv_bytes = csv_buffer.getvalue().encode("utf-8")
-    st.download_button("Download Predictions CSV", data=csv_bytes, file_name="predictions.csv", mime="text/csv")
+    col_prev, col_page, col_next = st.columns([1, 2, 1])
+    col_prev.button("Previous", disabled=len(cursors) == 1, on_click=cursors.pop)
+    col_page.caption(f"Page {len(cursors)} of {max(1, -(-summary.count // PAGE_SIZE))} ({summary.count:,} predictions)")
+    col_next.button("Next", disabled=next_cursor is None, on_click=cursors.append, args=(next_cursor,))
 
-    # PDF Report
-    with st.spinner("Generating PDF..."):
-        pdf_buffer = build_pdf(df, {"name": user_name, "email": user_email})
+    # Full history PDF: a worker pages the rows from Postgres itself, none are fetched here
+    st.subheader("Full History Report")
+    st.caption(f"Every one of your {summary.count:,} filtered predictions, {HISTORY_ROWS_PER_PAGE} rows per page.")
+    if len(cursors) == 1:
+        newest_page = df_preview
+    else:
+        try:
+            newest_page, _ = source.page(chosen_nbh, None, 1)
+        except Exception as e:
+            st.error(f"Error fetching predictions: {e}")
+            return
+    newest = newest_page[["timestamp", "id"]].iloc[0].tolist() if not newest_page.empty else None
+    user_info = {"name": user_name, "email": user_email}
+    history_id = history_key(user_uid, chosen_nbh, summary.count, newest, user_info, REPORT_TEMPLATE_VERSION)
+    pdf_download(
+        history_id, "Generate Full History PDF", "Download Full History PDF", "prediction_history.pdf",
+        lambda: report_jobs.submit_full_history(history_id, user_uid, chosen_nbh, user_info),
+    )
 
-    st.download_button("Download PDF Report", data=pdf_buffer, file_name="prediction_report.pdf", mime="application/pdf")
+    # History download: pages are streamed into a temporary file in the chosen format,
+    # so the full history is never held as a DataFrame or a Python string
+    st.subheader("Download History")
+    export_format = st.radio(
+        "Format", list(EXPORT_FORMATS), horizontal=True,
+        format_func=lambda f: EXPORT_FORMATS[f][0],
+    )
+    export_id = history_key(user_uid, chosen_nbh, summary.count, newest, user_info, f"export-{export_format}")
+    export = st.session_state.get("report_export")
+    if export is not None and (export.key != export_id or not export.exists()):
+        # Filters or format changed, or the file was cleaned up: remove the old export
+        export.remove()
+        export = st.session_state["report_export"] = None
+    if export is None and st.button("Prepare download"):
+        try:
+            with st.spinner("Exporting predictions..."):
+                path = export_history_file(source.pages(chosen_nbh), export_format)
+        except Exception as e:
+            st.error(f"Error fetching predictions: {e}")
+            return
+        export = st.session_state["report_export"] = ExportFile(export_id, path)
+    if export is not None:
+        _, file_name, mime = EXPORT_FORMATS[export_format]
+        try:
+            with open(export.path, "rb") as f:
+                st.download_button("Download Predictions", data=f, file_name=file_name, mime=mime)
+        except FileNotFoundError:
+            export.remove()
+            st.session_state["report_export"] = None
+            st.warning("The prepared download has expired. Please prepare it again.")
+
+    # The summary PDF is keyed on every filtered row, so only fetch them when asked for
+    if not st.checkbox("Prepare PDF summary report"):
+        return
+
+    try:
+        df = source.all_rows(chosen_nbh)
+    except Exception as e:
+        st.error(f"Error fetching predictions: {e}")
+        return
+
+    if "predicted_price" not in df.columns:
+        st.error("Prediction data does not contain 'predicted_price' column.")
+        return
 
+    # cast numeric
+    df["predicted_price"] = pd.to_numeric(df["predicted_price"], errors="coerce")
+
+    # PDF Report: rendered only when requested, in a background worker process, and
+    # cached by content so identical requests (same rows, user and template) never render twice
+    pdf_key = report_key(df, user_info, REPORT_TEMPLATE_VERSION)
+    pdf_download(
+        pdf_key, "Generate PDF Report", "Download PDF Report", "prediction_report.pdf",
+        lambda: report_jobs.submit(pdf_key, df, user_info),
+    )
+
+
+def pdf_download(job_id: str, generate_label: str, download_label: str, file_name: str, submit):
+    """
+    Download button for a cached PDF, or a button that starts `submit()` and the
+    progress of the running job.
+    """
+    pdf_bytes = pdf_cache.get(job_id)
+    if pdf_bytes is None:
+        job = report_jobs.job_status(job_id)
+        if job is not None and job.status == DONE:
+            # Built, but evicted from the cache (or too large to keep) since: build it again
+            report_jobs.forget(job_id)
+            job = None
+        if (job is None or job.status == FAILED) and st.button(generate_label):
+            try:
+                submit()
+            except ReportQueueFull:
+                st.warning("The report service is busy. Please try again in a minute.")
+        if report_jobs.job_status(job_id) is not None:
+            pdf_job_status(job_id)
+        return
+
+    st.download_button(download_label, data=pdf_bytes, file_name=file_name, mime="application/pdf")
     st.success("Report ready!")
+
+
+@st.fragment(run_every=1)
+def pdf_job_status(job_id: str):
+    """
+    Progress of a background PDF build; reruns the page once the PDF is in the cache.
+    """
+    job = report_jobs.job_status(job_id)
+    if job is None:
+        return
+    if job.status == FAILED:
+        st.error(f"PDF generation failed: {job.error}")
+        return
+    if job.status == DONE:
+        if not pdf_cache.contains(job_id):
+            # Gone from the cache already; the rerun offers to generate it again
+            report_jobs.forget(job_id)
+        st.rerun()
+    st.progress(job.progress(report_jobs.expected_seconds()), text="Generating PDF...")
+    st.caption(f"{report_jobs.queue_depth()} report(s) in the queue")
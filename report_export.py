@@ -0,0 +1,190 @@
+import gzip
+import os
+import tempfile
+import weakref
+
+import pandas as pd
+
+# Download formats offered on the report page: (label, file name, MIME type)
+CSV = "csv"
+CSV_GZIP = "csv.gz"
+PARQUET = "parquet"
+EXPORT_FORMATS = {
+    CSV: ("CSV", "predictions.csv", "text/csv"),
+    CSV_GZIP: ("CSV (gzip)", "predictions.csv.gz", "application/gzip"),
+    PARQUET: ("Parquet", "predictions.parquet", "application/vnd.apache.parquet"),
+}
+
+# Rows buffered per Parquet row group
+PARQUET_ROW_GROUP_ROWS = 50000
+
+
+def _clean(page: pd.DataFrame, columns) -> pd.DataFrame:
+    page = page.reindex(columns=columns)
+    if "predicted_price" in page.columns:
+        page["predicted_price"] = pd.to_numeric(page["predicted_price"], errors="coerce")
+    return page
+
+
+def iter_csv_chunks(pages):
+    """
+    UTF-8 CSV bytes, one chunk per page of rows, with the header only on the first.
+    """
+    columns = None
+    for page in pages:
+        header = columns is None
+        if header:
+            columns = list(page.columns)
+        yield _clean(page, columns).to_csv(index=False, header=header).encode("utf-8")
+
+
+def _write_parquet(pages, out) -> None:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Fixed types for the prediction table, so a column that is all null in the first
+    # page can't pin the file schema to the null type
+    known = {
+        "id": pa.int64(), "sq_mtrs": pa.float64(), "bedrooms": pa.float64(), "bathrooms": pa.float64(),
+        "predicted_price": pa.float64(), "timestamp": pa.timestamp("us"),
+    }
+    writer, schema, columns, buffered, buffered_rows = None, None, None, [], 0
+    try:
+        for page in pages:
+            if writer is None:
+                columns = list(page.columns)
+                schema = pa.schema([(c, known.get(c, pa.string())) for c in columns])
+                writer = pq.ParquetWriter(out, schema)
+            page = _clean(page, columns)
+            for name in columns:
+                if name == "timestamp":
+                    page[name] = pd.to_datetime(page[name], errors="coerce")
+                elif name in known:
+                    page[name] = pd.to_numeric(page[name], errors="coerce")
+                else:
+                    page[name] = page[name].astype(str).where(page[name].notna())
+            buffered.append(pa.Table.from_pandas(page, schema=schema, preserve_index=False))
+            buffered_rows += len(page)
+            if buffered_rows >= PARQUET_ROW_GROUP_ROWS:
+                writer.write_table(pa.concat_tables(buffered))
+                buffered, buffered_rows = [], 0
+        if writer is None:
+            return
+        if buffered:
+            writer.write_table(pa.concat_tables(buffered))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def export_history(pages, export_format: str, out) -> None:
+    """
+    Write every row of `pages` (an iterable of DataFrames, e.g. report_queries.iter_pages)
+    to the binary file `out` in one of EXPORT_FORMATS. Only one page of rows is in
+    memory at a time (one row group for Parquet).
+    """
+    if export_format == CSV:
+        for chunk in iter_csv_chunks(pages):
+            out.write(chunk)
+    elif export_format == CSV_GZIP:
+        with gzip.GzipFile(fileobj=out, mode="wb", compresslevel=6) as gz:
+            for chunk in iter_csv_chunks(pages):
+                gz.write(chunk)
+    elif export_format == PARQUET:
+        _write_parquet(pages, out)
+    else:
+        raise ValueError(f"Unknown export format: {export_format}")
+
+
+def export_history_file(pages, export_format: str) -> str:
+    """
+    export_history into a new temporary file; returns its path (the caller removes it).
+    """
+    fd, path = tempfile.mkstemp(prefix="predictions-", suffix="." + export_format)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            export_history(pages, export_format, out)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class ExportFile:
+    """
+    A file made by export_history_file for one export `key`. The file is removed by
+    `remove()`, or once this object is garbage collected (e.g. with the session state
+    holding it) or the process exits.
+    """
+
+    def __init__(self, key: str, path: str):
+        self.key = key
+        self.path = path
+        self._finalizer = weakref.finalize(self, _remove_file, path)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def remove(self) -> None:
+        self._finalizer()
+
+
+if __name__ == "__main__":
+    import time
+    import tracemalloc
+    from io import StringIO
+
+    import numpy as np
+
+    # Peak Python memory of the old StringIO path against the streamed export
+    n, page_size = 200_000, 1000
+    rng = np.random.default_rng(0)
+    history = pd.DataFrame({
+        "id": np.arange(n),
+        "user_id": "6f1c2a9e-user",
+        "sub_county": rng.choice(["Westlands", "Kasarani", "Embakasi"], n),
+        "neighborhood": rng.choice(["Kilimani", "Roysambu", "Utawala"], n),
+        "sq_mtrs": rng.integers(20, 400, n),
+        "bedrooms": rng.integers(1, 6, n),
+        "bathrooms": rng.integers(1, 5, n),
+        "predicted_price": np.exp(rng.normal(11.5, 0.8, n)).round(2),
+        "predicted_price_range": "KES 90,000 - KES 140,000",
+        "timestamp": "2025-01-01 10:00:00",
+    })
+
+    def pages():
+        for start in range(0, n, page_size):
+            yield history.iloc[start:start + page_size]
+
+    tracemalloc.start()
+    buffer = StringIO()
+    history.to_csv(buffer, index=False)
+    csv_bytes = buffer.getvalue().encode("utf-8")
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"StringIO:     {len(csv_bytes) / 1e6:6.1f} MB file, peak {peak / 1e6:6.1f} MB")
+    del buffer, csv_bytes
+
+    for export_format in EXPORT_FORMATS:
+        start = time.perf_counter()
+        os.remove(export_history_file(pages(), export_format))
+        elapsed = time.perf_counter() - start
+
+        # Timed separately: tracemalloc slows allocation-heavy code a lot
+        tracemalloc.start()
+        path = export_history_file(pages(), export_format)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{export_format:<12}  {os.path.getsize(path) / 1e6:6.1f} MB file, peak {peak / 1e6:6.1f} MB, {elapsed:.2f} s")
+        if export_format == PARQUET:
+            assert len(pd.read_parquet(path)) == n
+        else:
+            assert len(pd.read_csv(path)) == n
+        os.remove(path)
@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+
+# Half-width of the +/- range printed next to each predicted price
+PRICE_RANGE_HALF_WIDTH = 50000
+
+MISSING = "N/A"
+
+
+# Every 3-digit group as written at the front of a number ("7") and after a comma ("007")
+_LEADING_GROUPS = np.array([str(i) for i in range(1000)], dtype=object)
+_INNER_GROUPS = np.array([f"{i:03d}" for i in range(1000)], dtype=object)
+
+
+def _with_separators(whole: np.ndarray) -> np.ndarray:
+    # Assemble "1,234,567" right to left from group lookups, one pass per 3 digits
+    remaining = np.abs(whole)
+    higher = remaining // 1000
+    text = np.where(higher > 0, _INNER_GROUPS[remaining % 1000], _LEADING_GROUPS[remaining % 1000])
+    while higher.any():
+        remaining, higher = higher, higher // 1000
+        group = np.where(higher > 0, _INNER_GROUPS[remaining % 1000], _LEADING_GROUPS[remaining % 1000])
+        text = np.where(remaining > 0, group + "," + text, text)
+    return np.where(whole < 0, "-" + text, text)
+
+
+def format_amounts(values) -> pd.Series:
+    """
+    Whole-column equivalent of f"{x:,.0f}" (NaN -> ""), without a Python call per value.
+    """
+    values = pd.to_numeric(pd.Series(values), errors="coerce")
+    index = values.index
+    values = values.to_numpy(dtype=np.float64)
+    finite = np.isfinite(values)
+    # np.rint rounds half to even, like format()
+    text = _with_separators(np.rint(np.where(finite, values, 0)).astype(np.int64))
+    return pd.Series(np.where(finite, text, ""), index=index, dtype=object)
+
+
+def format_price_ranges(prices, half_width: float = PRICE_RANGE_HALF_WIDTH) -> pd.Series:
+    """
+    "low - high" strings around each price (low floored at 0), "N/A" where missing.
+    """
+    prices = pd.to_numeric(pd.Series(prices), errors="coerce")
+    low = format_amounts(np.maximum(prices - half_width, 0))
+    high = format_amounts(prices + half_width)
+    return (low + " - " + high).where(prices.notna(), MISSING)
+
+
+def format_cells(column: pd.Series) -> np.ndarray:
+    # str() of each value, "" where missing
+    text = column.astype(str).to_numpy(dtype=object)
+    text[column.isna().to_numpy()] = ""
+    return text
+
+
+def table_rows(df: pd.DataFrame, cols: list, amount_cols=("predicted_price",)) -> list:
+    """
+    Header plus one list of display strings per row, ready for a ReportLab Table.
+    Columns in `amount_cols` get thousands separators; the rest are str()'d.
+    """
+    if df.empty:
+        return [list(cols)]
+    formatted = [
+        format_amounts(df[c]).to_numpy(dtype=object) if c in amount_cols else format_cells(df[c])
+        for c in cols
+    ]
+    return [list(cols)] + np.column_stack(formatted).tolist()
+
+
+if __name__ == "__main__":
+    import time
+
+    def reference_rows(df, cols):
+        # The original per-cell loop from build_pdf
+        rows = [cols]
+        for _, row in df[cols].iterrows():
+            line = []
+            for c in cols:
+                val = row[c]
+                if pd.isna(val):
+                    line.append("")
+                elif c in ["predicted_price"]:
+                    line.append(f"{val:,.0f}")
+                else:
+                    line.append(str(val))
+            rows.append(line)
+        return rows
+
+    def reference_ranges(prices):
+        return prices.apply(lambda x: f"{max(x-50000,0):,.0f} - {x+50000:,.0f}" if pd.notna(x) else "N/A")
+
+    rng = np.random.default_rng(0)
+
+    def sample(n):
+        prices = np.exp(rng.normal(11.5, 0.8, n))
+        prices[rng.random(n) < 0.01] = np.nan
+        return pd.DataFrame({
+            "sub_county": rng.choice(["Westlands", "Kasarani", "Embakasi"], n),
+            "neighborhood": rng.choice(["Kilimani", "Roysambu", "Utawala", None], n),
+            "sq_mtrs": rng.integers(20, 400, n).astype(float),
+            "bedrooms": rng.integers(1, 6, n),
+            "bathrooms": rng.integers(1, 5, n),
+            "predicted_price": prices,
+        })
+
+    cols = ["sub_county", "neighborhood", "sq_mtrs", "bedrooms", "bathrooms", "predicted_price", "predicted_price_range"]
+
+    # Parity with the per-cell code, including NaN and round-half-even edge cases
+    check = sample(5000)
+    check.loc[:3, "predicted_price"] = [0.5, 1.5, 2500.5, 49999.5]
+    check.index += 100  # results must align with the input index
+    check["predicted_price_range"] = reference_ranges(check["predicted_price"])
+    assert format_price_ranges(check["predicted_price"]).tolist() == check["predicted_price_range"].tolist()
+    assert table_rows(check, cols) == reference_rows(check, cols)
+    print("parity: ok")
+
+    for n in (10, 10_000, 1_000_000):
+        df = sample(n)
+        start = time.perf_counter()
+        df["predicted_price_range"] = format_price_ranges(df["predicted_price"])
+        table_rows(df, cols)
+        vectorized = time.perf_counter() - start
+
+        # The per-cell path takes minutes at 1M rows; time it on a slice and scale
+        m = min(n, 10_000)
+        part = df.iloc[:m].copy()
+        start = time.perf_counter()
+        part["predicted_price_range"] = reference_ranges(part["predicted_price"])
+        reference_rows(part, cols)
+        per_cell = (time.perf_counter() - start) * n / m
+        print(f"{n:>9,} rows: vectorized {vectorized * 1e3:9.1f} ms ({vectorized / n * 1e6:.2f} us/row), "
+              f"per-cell {per_cell * 1e3:9.1f} ms{' (extrapolated)' if m < n else ''}")
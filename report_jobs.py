@@ -0,0 +1,258 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from multiprocessing import context, popen_spawn_posix, spawn
+
+from pdf_cache import pdf_cache
+
+# Worker processes rendering PDFs, and how many jobs may wait or run at once before
+# new requests are turned away (so report bursts can't starve predictions of CPU)
+REPORT_WORKERS = int(os.environ.get("REPORT_WORKERS", "2"))
+MAX_PENDING_JOBS = int(os.environ.get("REPORT_MAX_PENDING", "8"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class ReportQueueFull(RuntimeError):
+    """Raised when MAX_PENDING_JOBS report builds are already waiting or running."""
+
+
+@dataclass
+class ReportJob:
+    job_id: str
+    status: str = QUEUED
+    submitted_at: float = field(default_factory=time.monotonic)
+    started_at: float | None = None
+    finished_at: float | None = None
+    error: str | None = None
+
+    def progress(self, expected_seconds: float) -> float:
+        """
+        Estimated completion in [0, 1], from elapsed time against recent build times.
+        """
+        if self.status == DONE:
+            return 1.0
+        if self.status != RUNNING or self.started_at is None:
+            return 0.0
+        return min((time.monotonic() - self.started_at) / max(expected_seconds, 0.1), 0.95)
+
+
+def _render(df, user_info) -> bytes:
+    # Runs in a worker process
+    from report_pdf import build_pdf
+
+    return build_pdf(df, user_info).getvalue()
+
+
+def _render_full_history(user_id: str, neighborhoods, user_info) -> bytes:
+    # Runs in a worker process: rows are paged from Postgres straight into the
+    # document, so neither process ever holds the whole history
+    import tempfile
+
+    from report_pdf import build_full_history_pdf
+    from report_queries import fetch_summary, iter_pages
+    from prediction_store import get_prediction_store
+
+    store = get_prediction_store()
+    summary = fetch_summary(store, user_id, neighborhoods)
+    with tempfile.TemporaryFile() as out:
+        build_full_history_pdf(iter_pages(store, user_id, neighborhoods), summary, user_info, out)
+        out.seek(0)
+        return out.read()
+
+
+# Set while a report worker is being launched on this thread
+_launching = threading.local()
+_launch_lock = threading.Lock()
+_stdlib_preparation_data = spawn.get_preparation_data
+
+
+def _worker_preparation_data(name):
+    data = _stdlib_preparation_data(name)
+    if getattr(_launching, "worker", False):
+        # Streamlit runs the page script as __main__, and a spawned worker told to
+        # re-run it would execute the whole app on start-up; workers only import what
+        # they unpickle
+        data.pop("init_main_from_name", None)
+        data.pop("init_main_from_path", None)
+    return data
+
+
+
+class _WorkerPopen(popen_spawn_posix.Popen):
+    # The stdlib launch, with spawn.get_preparation_data wrapped for the duration of
+    # the call so the child is not told to re-run __main__. Other threads spawning at
+    # the same time still get the unmodified preparation data.
+    def _launch(self, process_obj):
+        with _launch_lock:
+            _launching.worker = True
+            spawn.get_preparation_data = _worker_preparation_data
+            try:
+                super()._launch(process_obj)
+            finally:
+                spawn.get_preparation_data = _stdlib_preparation_data
+                _launching.worker = False
+
+
+class _WorkerProcess(context.SpawnProcess):
+    @staticmethod
+    def _Popen(process_obj):
+        return _WorkerPopen(process_obj)
+
+
+class _WorkerContext(context.SpawnContext):
+    Process = _WorkerProcess
+
+
+class ReportJobs:
+    """
+    Renders report PDFs in a process pool so ReportLab's CPU-bound `doc.build` runs
+    outside the Streamlit script threads and their GIL. Jobs are keyed by the report's
+    content key, so identical requests share one build; finished documents go into
+    the PDF cache.
+    """
+
+    def __init__(self, workers: int = REPORT_WORKERS, max_pending: int = MAX_PENDING_JOBS):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: ProcessPoolExecutor | None = None
+        self._jobs: dict[str, ReportJob] = {}
+        self._futures: dict = {}
+        self._durations: list[float] = []
+        self._lock = threading.Lock()
+        self._pool_lock = threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            # A worker that died (e.g. OOM on a huge report) breaks the whole pool; start a new one
+            if self._executor is None or getattr(self._executor, "_broken", False):
+                # spawn: never fork the multi-threaded Streamlit server
+                mp_context = _WorkerContext() if os.name == "posix" else multiprocessing.get_context("spawn")
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=mp_context)
+            return self._executor
+
+    def queue_depth(self) -> int:
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job.status in (QUEUED, RUNNING))
+
+    def expected_seconds(self) -> float:
+        with self._lock:
+            recent = self._durations[-20:]
+        return sum(recent) / len(recent) if recent else 5.0
+
+    def submit(self, job_id: str, df, user_info: dict) -> ReportJob:
+        """
+        Render the summary report for the rows in `df`.
+        """
+        return self._submit(job_id, _render, df, user_info)
+
+    def submit_full_history(self, job_id: str, user_id: str, neighborhoods, user_info: dict) -> ReportJob:
+        """
+        Render every prediction of `user_id` (optionally only some neighborhoods);
+        the worker pages the rows from Postgres itself.
+        """
+        return self._submit(job_id, _render_full_history, user_id, list(neighborhoods or []), user_info)
+
+    def _submit(self, job_id: str, fn, *args) -> ReportJob:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.status in (QUEUED, RUNNING):
+                return job
+            # A finished job whose PDF has since left the cache is built again
+            if job is not None and job.status == DONE and pdf_cache.contains(job_id):
+                return job
+            pending = sum(1 for j in self._jobs.values() if j.status in (QUEUED, RUNNING))
+            if pending >= self.max_pending:
+                raise ReportQueueFull(f"{pending} reports are already being generated")
+            job = self._jobs[job_id] = ReportJob(job_id)
+
+        # Outside the lock: submit() starts worker processes when the pool needs them
+        try:
+            future = self._pool().submit(fn, *args)
+        except Exception as e:
+            with self._lock:
+                job.status, job.error, job.finished_at = FAILED, str(e), time.monotonic()
+            raise
+        with self._lock:
+            self._futures[job_id] = future
+        future.add_done_callback(lambda f: self._finish(job_id, f))
+        return job
+
+    def _finish(self, job_id: str, future) -> None:
+        try:
+            pdf_bytes = future.result()
+        except Exception as e:
+            with self._lock:
+                job = self._jobs[job_id]
+                job.status, job.error, job.finished_at = FAILED, str(e), time.monotonic()
+                self._futures.pop(job_id, None)
+            return
+
+        pdf_cache.put(job_id, pdf_bytes)
+        with self._lock:
+            job = self._jobs[job_id]
+            job.status, job.finished_at = DONE, time.monotonic()
+            self._durations.append(job.finished_at - (job.started_at or job.submitted_at))
+            del self._durations[:-100]
+            self._futures.pop(job_id, None)
+            # Finished jobs only need to be remembered until their PDF is picked up from the cache
+            for old_id in [k for k, j in self._jobs.items() if j.status in (DONE, FAILED)][:-200]:
+                del self._jobs[old_id]
+
+    def forget(self, job_id: str) -> None:
+        """
+        Drop the record of a finished job, e.g. once its PDF has been evicted from the cache.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.status in (DONE, FAILED):
+                del self._jobs[job_id]
+
+    def job_status(self, job_id: str) -> ReportJob | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            future = self._futures.get(job_id)
+            if job is not None and job.status == QUEUED and future is not None and future.running():
+                job.status, job.started_at = RUNNING, time.monotonic()
+            return job
+
+
+# Process-wide job manager shared by every session
+report_jobs = ReportJobs()
+
+
+if __name__ == "__main__":
+    # A worker started from a page script without a __main__ guard must not run the
+    # script again (it would start workers of its own, forever). Catches a Python
+    # upgrade that changes how spawn prepares the child.
+    import subprocess
+    import sys
+    import tempfile
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as directory:
+        marker = os.path.join(directory, "runs.txt")
+        script = os.path.join(directory, "page.py")
+        with open(script, "w", encoding="utf-8") as f:
+            f.write(
+                "import os, sys\n"
+                f"sys.path.insert(0, {here!r})\n"
+                f"with open({marker!r}, 'a') as f:\n"
+                "    f.write(f'{os.getpid()}\\n')\n"
+                "from report_jobs import ReportJobs\n"
+                "worker_pid = ReportJobs(workers=1)._pool().submit(os.getpid).result(timeout=60)\n"
+                "print(worker_pid)\n"
+            )
+        result = subprocess.run([sys.executable, script], capture_output=True, text=True, timeout=120)
+        assert result.returncode == 0, result.stderr
+        with open(marker, encoding="utf-8") as f:
+            runs = f.read().split()
+        worker_pid = result.stdout.split()[-1]
+        assert worker_pid not in runs and len(runs) == 1, f"page script ran {len(runs)} times: {runs}"
+        print(f"worker {worker_pid} started without re-running the page script")
@@ -0,0 +1,257 @@
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import os
+from io import BytesIO
+
+from reportlab.lib.pagesizes import letter
+from reportlab.lib import colors
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.pdfgen import canvas
+from reportlab.platypus import SimpleDocTemplate, Frame, Paragraph, Spacer, Image as RLImage, Table, TableStyle
+
+from report_format import format_amounts, format_price_ranges, table_rows
+
+# Kept free of Streamlit and Supabase imports so report worker processes can load it cheaply
+
+# Bump whenever build_pdf's layout or wording changes, so cached PDFs are not reused
+REPORT_TEMPLATE_VERSION = "1"
+
+# Full-history layout: fixed row height, so every page holds the same number of rows
+HISTORY_COLUMNS = ["timestamp", "sub_county", "neighborhood", "sq_mtrs", "bedrooms", "bathrooms", "predicted_price", "predicted_price_range"]
+HISTORY_COL_WIDTHS = [70, 62, 80, 42, 42, 42, 72, 130]
+HISTORY_ROW_HEIGHT = 14
+HISTORY_ROWS_PER_PAGE = 44
+
+
+# --- PDF Builder (no charts) ---
+def build_pdf(df: pd.DataFrame, user_info: dict, logo_path: str = "./img/Logo1.png") -> BytesIO:
+    """
+    Build a multi-section PDF using reportlab.platypus and return BytesIO buffer.
+    """
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(
+        buffer, pagesize=letter,
+        rightMargin=36, leftMargin=36, topMargin=36, bottomMargin=36
+    )
+    styles = getSampleStyleSheet()
+    story = []
+
+    # Cover
+    title_style = styles["Title"]
+    normal = styles["BodyText"]
+
+    # Logo (optional)
+    try:
+        if os.path.exists(logo_path):
+            story.append(RLImage(logo_path, width=150, height=75))
+    except Exception:
+        pass
+
+    story.append(Spacer(1, 12))
+    story.append(Paragraph("PREDICTION REPORT", title_style))
+    story.append(Spacer(1, 6))
+    story.append(
+        Paragraph(
+            f"Generated for <b>{user_info.get('name','N/A')}</b> ({user_info.get('email','N/A')}) "
+            f"on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}.",
+            normal,
+        )
+    )
+    story.append(Spacer(1, 12))
+    story.append(
+        Paragraph(
+            "This report provides an overview of predicted housing prices from your recent queries. "
+            "It includes summary statistics and a preview of the predictions.",
+            normal,
+        )
+    )
+    story.append(Spacer(1, 18))
+
+    # Summary Stats
+    story.append(Paragraph("Summary Statistics", styles["Heading2"]))
+    stats_data = []
+    def fmt(x): return f"{x:,.0f}" if pd.notna(x) else "N/A"
+    avg_price = df["predicted_price"].mean() if not df["predicted_price"].empty else np.nan
+    min_price = df["predicted_price"].min() if not df["predicted_price"].empty else np.nan
+    max_price = df["predicted_price"].max() if not df["predicted_price"].empty else np.nan
+    std_price = df["predicted_price"].std() if not df["predicted_price"].empty else np.nan
+
+    stats_data.append(["Average Predicted Price:", fmt(avg_price)])
+    stats_data.append(["Minimum Predicted Price:", fmt(min_price)])
+    stats_data.append(["Maximum Predicted Price:", fmt(max_price)])
+    stats_data.append(["Std Dev of Predicted Price:", fmt(std_price)])
+
+    t = Table(stats_data, colWidths=[250, 200])
+    t.setStyle(
+        TableStyle(
+            [
+                ("BACKGROUND", (0, 0), (-1, 0), colors.whitesmoke),
+                ("FONTNAME", (0, 0), (-1, -1), "Helvetica"),
+                ("FONTSIZE", (0, 0), (-1, -1), 10),
+                ("LINEBELOW", (0, 0), (-1, -1), 0.25, colors.grey),
+            ]
+        )
+    )
+    story.append(t)
+    story.append(Spacer(1, 12))
+
+    # Preview Table (first 10 rows with predicted price range)
+    story.append(Paragraph("Predictions Preview (first 10 rows)", styles["Heading2"]))
+    preview = df.head(10).copy()
+    if not preview.empty:
+        preview["predicted_price_range"] = format_price_ranges(preview["predicted_price"])
+
+    cols_to_show = ["sub_county", "neighborhood", "sq_mtrs", "bedrooms", "bathrooms", "predicted_price", "predicted_price_range"]
+    cols = [c for c in cols_to_show if c in preview.columns]
+
+    if preview.empty:
+        story.append(Paragraph("No data to display.", normal))
+    else:
+        table_data = table_rows(preview, cols)
+
+        tbl = Table(table_data, repeatRows=1, colWidths=[80] * len(cols))
+        tbl.setStyle(
+            TableStyle(
+                [
+                    ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#f2f2f2")),
+                    ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+                    ("FONTNAME", (0, 0), (-1, -1), "Helvetica"),
+                    ("FONTSIZE", (0, 0), (-1, -1), 9),
+                ]
+            )
+        )
+        story.append(tbl)
+
+    story.append(Spacer(1, 18))
+
+    # Disclaimer & Footer
+    story += _notes(styles)
+
+    # Build document
+    doc.build(story)
+    buffer.seek(0)
+    return buffer
+
+
+def _notes(styles) -> list:
+    small = ParagraphStyle("small", parent=styles["Normal"], fontSize=9)
+    return [
+        Paragraph("Notes", styles["Heading2"]),
+        Paragraph(
+            "These predictions are generated by a statistical model and should be used for informational purposes only. "
+            "They are estimates and may not reflect actual market prices. Use additional sources when making financial decisions.",
+            styles["BodyText"],
+        ),
+        Spacer(1, 12),
+        Paragraph(f"© {datetime.now().year} Kelvin Njuguna | All rights reserved.", small),
+    ]
+
+
+def _history_page(c, rows: list, prices: np.ndarray, first_row: int, total_rows: int, page_number: int) -> None:
+    width, height = letter
+    c.setFont("Helvetica-Bold", 11)
+    c.drawString(36, height - 36, "Prediction History")
+    c.setFont("Helvetica", 8)
+    c.drawRightString(width - 36, height - 36, f"Rows {first_row + 1:,}-{first_row + len(rows):,} of {total_rows:,}")
+
+    # Header repeated on every page, then the rows, then this page's subtotal
+    priced = prices[np.isfinite(prices)]
+    subtotal = ["Page subtotal", f"{len(rows)} rows", "", "", "", "",
+                format_amounts([priced.sum()])[0] if priced.size else "",
+                f"avg {format_amounts([priced.mean()])[0]}" if priced.size else ""]
+    data = [HISTORY_COLUMNS] + rows + [subtotal]
+    tbl = Table(data, colWidths=HISTORY_COL_WIDTHS, rowHeights=HISTORY_ROW_HEIGHT)
+    tbl.setStyle(
+        TableStyle(
+            [
+                ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#f2f2f2")),
+                ("BACKGROUND", (0, -1), (-1, -1), colors.whitesmoke),
+                ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+                ("FONTNAME", (0, 0), (-1, -1), "Helvetica"),
+                ("FONTNAME", (0, -1), (-1, -1), "Helvetica-Bold"),
+                ("FONTSIZE", (0, 0), (-1, -1), 7),
+            ]
+        )
+    )
+    _, table_height = tbl.wrapOn(c, width - 72, height - 72)
+    tbl.drawOn(c, 36, height - 48 - table_height)
+    c.drawCentredString(width / 2, 24, f"Page {page_number}")
+    c.showPage()
+
+
+def build_full_history_pdf(pages, summary, user_info: dict, out, logo_path: str = "./img/Logo1.png") -> None:
+    """
+    Write a report with every prediction to the binary file `out`.
+
+    `pages` is an iterable of DataFrames (e.g. report_queries.iter_pages) and
+    `summary` a report_queries.ReportSummary for the same rows. Rows are formatted
+    and drawn one chunk at a time, HISTORY_ROWS_PER_PAGE per page with the header
+    repeated and a page subtotal, so only one chunk is ever held as a DataFrame;
+    finished pages are kept compressed by the canvas until it is saved.
+    """
+    c = canvas.Canvas(out, pagesize=letter, pageCompression=1)
+    width, height = letter
+    styles = getSampleStyleSheet()
+
+    # Cover page: title, summary (aggregated server-side) and notes
+    def fmt(x): return f"{x:,.0f}" if pd.notna(x) else "N/A"
+    cover = []
+    if os.path.exists(logo_path):
+        cover.append(RLImage(logo_path, width=150, height=75))
+    cover += [
+        Spacer(1, 12),
+        Paragraph("PREDICTION HISTORY REPORT", styles["Title"]),
+        Spacer(1, 6),
+        Paragraph(
+            f"Generated for <b>{user_info.get('name','N/A')}</b> ({user_info.get('email','N/A')}) "
+            f"on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}.",
+            styles["BodyText"],
+        ),
+        Spacer(1, 12),
+        Paragraph(f"This report lists all {summary.count:,} predictions, newest first.", styles["BodyText"]),
+        Spacer(1, 18),
+        Paragraph("Summary Statistics", styles["Heading2"]),
+        Table(
+            [
+                ["Number of Predictions:", f"{summary.count:,}"],
+                ["Average Predicted Price:", fmt(summary.avg_price)],
+                ["Minimum Predicted Price:", fmt(summary.min_price)],
+                ["Maximum Predicted Price:", fmt(summary.max_price)],
+                ["Std Dev of Predicted Price:", fmt(summary.std_price)],
+            ],
+            colWidths=[250, 200],
+            style=[("FONTNAME", (0, 0), (-1, -1), "Helvetica"), ("LINEBELOW", (0, 0), (-1, -1), 0.25, colors.grey)],
+        ),
+        Spacer(1, 18),
+    ] + _notes(styles)
+    Frame(36, 36, width - 72, height - 72, showBoundary=0).addFromList(cover, c)
+    c.showPage()
+
+    pending_rows, pending_prices = [], []
+    written, page_number = 0, 2
+    for chunk in pages:
+        chunk = chunk.copy()
+        chunk["predicted_price"] = pd.to_numeric(chunk["predicted_price"], errors="coerce")
+        chunk["predicted_price_range"] = format_price_ranges(chunk["predicted_price"])
+        for col in HISTORY_COLUMNS:
+            if col not in chunk.columns:
+                chunk[col] = None
+        timestamps = chunk["timestamp"]
+        chunk["timestamp"] = timestamps.astype(str).str.slice(0, 16).str.replace("T", " ").where(timestamps.notna())
+        pending_rows += table_rows(chunk, HISTORY_COLUMNS)[1:]
+        pending_prices.append(chunk["predicted_price"].to_numpy(dtype=np.float64))
+        prices = np.concatenate(pending_prices)
+
+        while len(pending_rows) >= HISTORY_ROWS_PER_PAGE:
+            _history_page(c, pending_rows[:HISTORY_ROWS_PER_PAGE], prices[:HISTORY_ROWS_PER_PAGE],
+                          written, summary.count, page_number)
+            written += HISTORY_ROWS_PER_PAGE
+            page_number += 1
+            del pending_rows[:HISTORY_ROWS_PER_PAGE]
+            prices = prices[HISTORY_ROWS_PER_PAGE:]
+        pending_prices = [prices]
+
+    if pending_rows:
+        _history_page(c, pending_rows, np.concatenate(pending_prices), written, summary.count, page_number)
+    c.save()
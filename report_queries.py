@@ -0,0 +1,118 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+# Rows per preview page and per request when all rows are really needed (downloads)
+PAGE_SIZE = 50
+FETCH_BATCH_SIZE = 1000
+
+
+@dataclass(frozen=True)
+class ReportSummary:
+    count: int
+    avg_price: float
+    min_price: float
+    max_price: float
+    std_price: float
+
+
+def _neighborhood_filter(neighborhoods):
+    # None (not an empty list) means "all neighborhoods" to the SQL functions
+    return list(neighborhoods) if neighborhoods else None
+
+
+def fetch_neighborhoods(store, user_id: str) -> list:
+    """
+    Distinct neighborhoods the user has predictions for (sql/report_functions.sql).
+    """
+    rows = store.call("prediction_report_neighborhoods", {"p_user_id": user_id})
+    return [row["neighborhood"] for row in rows]
+
+
+def fetch_summary(store, user_id: str, neighborhoods=None) -> ReportSummary:
+    """
+    Count, mean, min, max and std of predicted_price, aggregated in Postgres.
+    """
+    rows = store.call("prediction_report_summary",
+                 {"p_user_id": user_id, "p_neighborhoods": _neighborhood_filter(neighborhoods)})
+    row = (rows or [{}])[0]
+
+    def number(key):
+        value = row.get(key)
+        return float(value) if value is not None else np.nan
+
+    return ReportSummary(
+        int(row.get("row_count") or 0),
+        number("avg_price"), number("min_price"), number("max_price"), number("std_price"),
+    )
+
+
+def fetch_page(store, user_id: str, neighborhoods=None, cursor=None, page_size: int = PAGE_SIZE):
+    """
+    One page of prediction rows, newest first, using keyset pagination on
+    (user_id, timestamp, id). Returns (DataFrame, cursor for the next page or None).
+    """
+    before_timestamp, before_id = cursor if cursor else (None, None)
+    rows = store.call("prediction_report_page", {
+        "p_user_id": user_id,
+        "p_neighborhoods": _neighborhood_filter(neighborhoods),
+        "p_before_timestamp": before_timestamp,
+        "p_before_id": before_id,
+        "p_limit": page_size,
+    })
+    next_cursor = (rows[-1]["timestamp"], rows[-1]["id"]) if len(rows) == page_size else None
+    return pd.DataFrame(rows), next_cursor
+
+
+def iter_pages(store, user_id: str, neighborhoods=None, page_size: int = FETCH_BATCH_SIZE):
+    """
+    Every matching row, one DataFrame page at a time.
+    """
+    cursor = None
+    while True:
+        page, cursor = fetch_page(store, user_id, neighborhoods, cursor, page_size)
+        if not page.empty:
+            yield page
+        if cursor is None:
+            return
+
+
+def fetch_all(store, user_id: str, neighborhoods=None) -> pd.DataFrame:
+    pages = list(iter_pages(store, user_id, neighborhoods))
+    return pd.concat(pages, ignore_index=True) if pages else pd.DataFrame()
+
+
+def fetch_since(store, user_id: str, after_id: int = 0, limit: int = FETCH_BATCH_SIZE) -> list:
+    """
+    Up to `limit` rows with id > after_id, oldest first (prediction_history_since).
+    """
+    return store.call("prediction_history_since",
+                 {"p_user_id": user_id, "p_after_id": after_id, "p_limit": limit})
+
+
+class RemoteReport:
+    """
+    The report queries for one user, run by a prediction_store.PredictionStore.
+    history_cache.LocalReport answers the same calls from memory.
+    """
+
+    def __init__(self, store, user_id: str):
+        self.store = store
+        self.user_id = user_id
+
+    def neighborhoods(self) -> list:
+        return fetch_neighborhoods(self.store, self.user_id)
+
+    def summary(self, neighborhoods=None) -> ReportSummary:
+        return fetch_summary(self.store, self.user_id, neighborhoods)
+
+    def page(self, neighborhoods=None, cursor=None, page_size: int = PAGE_SIZE):
+        return fetch_page(self.store, self.user_id, neighborhoods, cursor, page_size)
+
+    def pages(self, neighborhoods=None, page_size: int = FETCH_BATCH_SIZE):
+        return iter_pages(self.store, self.user_id, neighborhoods, page_size)
+
+    def all_rows(self, neighborhoods=None) -> pd.DataFrame:
+        return fetch_all(self.store, self.user_id, neighborhoods)
@@ -0,0 +1,64 @@
+-- Typed listings table filled by ingest_listings.py (COPY into a staging table, then
+-- merged here). Safe to re-run.
+
+create table if not exists public.listings (
+    id bigint generated always as identity primary key,
+    sub_county text not null,
+    neighborhood text not null,
+    sq_mtrs double precision,
+    bedrooms smallint,
+    bathrooms smallint,
+    price bigint not null,
+    agency text,
+    link text,
+    source text,
+    -- listing_row_hash() of the cleaned listing fields: the same listing loaded twice
+    -- (or from two files) is stored once, like drop_duplicates() in the notebook
+    row_hash text not null unique,
+    ingested_at timestamptz not null default now()
+);
+
+-- Form options and market statistics group by location
+create index if not exists listings_location_idx
+    on public.listings (sub_county, neighborhood);
+
+-- Comparables look up exact (neighborhood, bedrooms, bathrooms) matches
+create index if not exists listings_comparables_idx
+    on public.listings (neighborhood, bedrooms, bathrooms);
+
+-- Number from a scraped field ("KSh 155,000", " 4.0 "); null when it isn't one.
+-- A single expression, so the planner inlines it into the merge query.
+create or replace function public.listing_number(value text)
+returns numeric
+language sql immutable parallel safe
+as $$
+    select case when regexp_replace(value, '[^0-9.]', '', 'g') ~ '^[0-9]+(\.[0-9]+)?$'
+                then regexp_replace(value, '[^0-9.]', '', 'g')::numeric end;
+$$;
+
+-- Dedup key of a cleaned listing. The row's text form keeps every field in its own
+-- position and writes NULL differently from '', so (3, 3, NULL) and (3, NULL, 3) differ.
+create or replace function public.listing_row_hash(
+    sub_county text, neighborhood text, sq_mtrs double precision,
+    bedrooms smallint, bathrooms smallint, price bigint
+)
+returns text
+language sql immutable parallel safe
+as $$
+    select md5(row(sub_county, neighborhood, sq_mtrs, bedrooms, bathrooms, price)::text);
+$$;
+
+-- Tables created before listing_row_hash() hashed concat_ws('|', ...), which skips
+-- NULLs; rehash them once. The column comment records which key is in use.
+do $$
+begin
+    if col_description('public.listings'::regclass,
+                       (select attnum from pg_attribute
+                        where attrelid = 'public.listings'::regclass and attname = 'row_hash'))
+       is distinct from 'listing_row_hash' then
+        update public.listings
+        set row_hash = public.listing_row_hash(sub_county, neighborhood, sq_mtrs, bedrooms, bathrooms, price);
+        comment on column public.listings.row_hash is 'listing_row_hash';
+    end if;
+end
+$$;
@@ -0,0 +1,90 @@
+-- Server-side report queries for report.display_report().
+-- Apply once in the Supabase SQL editor (or psql). The functions are exposed through
+-- PostgREST and called with supabase.rpc(...) from report_queries.py.
+
+-- Keyset pagination and the per-user aggregates all scan this index only
+create index if not exists prediction_user_timestamp_idx
+    on public.prediction (user_id, "timestamp" desc, id desc);
+
+
+-- Count / mean / min / max / std of predicted_price, optionally limited to some neighborhoods
+create or replace function public.prediction_report_summary(
+    p_user_id text,
+    p_neighborhoods text[] default null
+)
+returns table (
+    row_count bigint,
+    avg_price double precision,
+    min_price double precision,
+    max_price double precision,
+    std_price double precision
+)
+language sql stable
+as $$
+    select count(*),
+           avg(predicted_price)::double precision,
+           min(predicted_price)::double precision,
+           max(predicted_price)::double precision,
+           stddev_samp(predicted_price)::double precision
+    from public.prediction
+    where user_id = p_user_id
+      and (p_neighborhoods is null or neighborhood = any(p_neighborhoods));
+$$;
+
+
+-- Distinct neighborhoods the user has predictions for, for the sidebar filter
+create or replace function public.prediction_report_neighborhoods(p_user_id text)
+returns table (neighborhood text)
+language sql stable
+as $$
+    select distinct p.neighborhood
+    from public.prediction p
+    where p.user_id = p_user_id and p.neighborhood is not null
+    order by 1;
+$$;
+
+
+-- One page of rows, newest first. Pass the last row's ("timestamp", id) of the previous
+-- page as the cursor; null starts from the newest row.
+create or replace function public.prediction_report_page(
+    p_user_id text,
+    p_neighborhoods text[] default null,
+    p_before_timestamp timestamp default null,
+    p_before_id bigint default null,
+    p_limit integer default 50
+)
+returns setof public.prediction
+language sql stable
+as $$
+    select *
+    from public.prediction p
+    where p.user_id = p_user_id
+      and (p_neighborhoods is null or p.neighborhood = any(p_neighborhoods))
+      and (p_before_timestamp is null
+           or (p."timestamp", p.id) < (p_before_timestamp, p_before_id))
+    order by p."timestamp" desc, p.id desc
+    limit p_limit;
+$$;
+
+
+-- Rows with an id above p_after_id, oldest first, for the in-process history cache
+-- (history_cache.py). Sequence ids don't depend on client-side timestamps, but
+-- concurrent inserts can commit out of id order, so callers re-read a window of ids
+-- behind the highest one they have seen and deduplicate by id.
+create index if not exists prediction_user_id_idx
+    on public.prediction (user_id, id);
+
+create or replace function public.prediction_history_since(
+    p_user_id text,
+    p_after_id bigint default 0,
+    p_limit integer default 1000
+)
+returns setof public.prediction
+language sql stable
+as $$
+    select *
+    from public.prediction p
+    where p.user_id = p_user_id and p.id > p_after_id
+    order by p.id
+    limit p_limit;
+$$;
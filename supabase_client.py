@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+
+import httpx
+from dotenv import load_dotenv
+from supabase import Client, create_client
+from supabase.lib.client_options import SyncClientOptions
+
+load_dotenv()
+
+# Timeouts (seconds) for table queries and storage downloads
+POSTGREST_TIMEOUT = float(os.environ.get("SUPABASE_POSTGREST_TIMEOUT", "10"))
+STORAGE_TIMEOUT = float(os.environ.get("SUPABASE_STORAGE_TIMEOUT", "20"))
+CONNECT_TIMEOUT = float(os.environ.get("SUPABASE_CONNECT_TIMEOUT", "5"))
+
+# Circuit breaker: open after this many consecutive failures, probe again after the cooldown
+BREAKER_FAILURES = int(os.environ.get("SUPABASE_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.environ.get("SUPABASE_BREAKER_COOLDOWN", "30"))
+
+
+class CircuitOpenError(ConnectionError):
+    """Raised instead of calling Supabase while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Stops calling Supabase after repeated failures so pages fail fast (and fall back
+    to cached data) instead of each waiting out a timeout. After `cooldown` seconds a
+    single trial call is let through; success closes the breaker again.
+    """
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURES, cooldown: float = BREAKER_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self.opened_at is not None and time.monotonic() - self.opened_at < self.cooldown
+
+    def call(self, fn, *args, **kwargs):
+        with self._lock:
+            if self.opened_at is not None:
+                if time.monotonic() - self.opened_at < self.cooldown:
+                    raise CircuitOpenError("Supabase circuit breaker is open")
+                # Half-open: let this call through, and keep others out until it returns
+                self.opened_at = time.monotonic()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            with self._lock:
+                self.failures += 1
+                if self.failures >= self.failure_threshold:
+                    self.opened_at = time.monotonic()
+            raise
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+        return result
+
+
+breaker = CircuitBreaker()
+
+# One client per process; its postgrest and storage sub-clients each keep a
+# persistent httpx session, so TLS connections are reused across reruns and sessions
+_client: Client | None = None
+_lock = threading.Lock()
+
+
+def get_supabase() -> Client | None:
+    """
+    Shared Supabase client, or None when the credentials are not configured.
+    """
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                url = os.environ.get("supabase_url")
+                key = os.environ.get("supabase_key")
+                if not url or not key:
+                    return None
+                options = SyncClientOptions(
+                    postgrest_client_timeout=httpx.Timeout(POSTGREST_TIMEOUT, connect=CONNECT_TIMEOUT),
+                    storage_client_timeout=httpx.Timeout(STORAGE_TIMEOUT, connect=CONNECT_TIMEOUT),
+                )
+                client = create_client(url, key, options=options)
+                # The sub-clients are created lazily and not thread-safe to create; build them now
+                client.postgrest
+                client.storage
+                _client = client
+    return _client
+
+
+def supabase_call(fn, *args, **kwargs):
+    """
+    Run a Supabase request through the shared circuit breaker.
+    """
+    return breaker.call(fn, *args, **kwargs)
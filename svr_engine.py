@@ -0,0 +1,174 @@
+import threading
+
+import numpy as np
+
+# Compiled engines keyed by model registry version
+_engines: dict[str, "SVREngine"] = {}
+_lock = threading.Lock()
+
+
+def _dense(matrix) -> np.ndarray:
+    # SVRs fitted on sparse input keep their support vectors and coefficients sparse
+    if hasattr(matrix, "toarray"):
+        matrix = matrix.toarray()
+    return np.asarray(matrix, dtype=np.float64)
+
+
+class SVREngine:
+    """
+    Pure-NumPy decision function for a fitted scikit-learn SVR.
+
+    The linear kernel is collapsed into a single weight vector. The RBF kernel is
+    evaluated as ||x - sv||^2 = ||x||^2 - 2 x.sv + ||sv||^2 with the support-vector
+    norms computed once, so a batch costs one matrix product. One-hot encoded inputs
+    are mostly zeros, so x.sv only gathers the support-vector columns that are set.
+    """
+
+    # Rows per block in the sparse gather path, and the density above which a dense
+    # matrix product is cheaper than gathering
+    BLOCK_ROWS = 1024
+    SPARSE_DENSITY = 0.1
+
+    def __init__(self, kernel, support_vectors, dual_coef, intercept, gamma=None, coef0=0.0, degree=3):
+        self.kernel = kernel
+        self.intercept = float(np.ravel(intercept)[0])
+        self.dual_coef = np.ascontiguousarray(np.ravel(dual_coef), dtype=np.float64)
+        self.gamma = None if gamma is None else float(gamma)
+        self.coef0 = float(coef0)
+        self.degree = int(degree)
+
+        if kernel == "linear":
+            self.weights = self.dual_coef @ support_vectors
+            self.support_vectors = None
+        elif kernel in ("rbf", "poly", "sigmoid"):
+            # Stored feature-major so the columns hit by a row are contiguous rows here
+            self.support_vectors = np.ascontiguousarray(np.asarray(support_vectors, dtype=np.float64).T)
+            self.sv_norms = np.einsum("ij,ij->j", self.support_vectors, self.support_vectors)
+        else:
+            raise ValueError(f"Unsupported SVR kernel: {kernel!r}")
+
+    @classmethod
+    def from_model(cls, model) -> "SVREngine":
+        kernel = model.kernel
+        if callable(kernel) or kernel == "precomputed":
+            raise ValueError("Callable and precomputed kernels are not supported")
+        return cls(
+            kernel,
+            _dense(model.support_vectors_),
+            _dense(model.dual_coef_),
+            model.intercept_,
+            gamma=model._gamma,
+            coef0=model.coef0,
+            degree=model.degree,
+        )
+
+    def predict(self, X) -> np.ndarray:
+        """
+        Predictions for a 2-D dense array (or a single 1-D row).
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+
+        if self.kernel == "linear":
+            return X @ self.weights + self.intercept
+
+        dot = self._dot(X)
+        if self.kernel == "rbf":
+            x_norms = np.einsum("ij,ij->i", X, X)
+            sq_dist = x_norms[:, np.newaxis] - 2.0 * dot + self.sv_norms
+            np.maximum(sq_dist, 0.0, out=sq_dist)
+            kernel = np.exp(-self.gamma * sq_dist, out=sq_dist)
+        elif self.kernel == "poly":
+            kernel = (self.gamma * dot + self.coef0) ** self.degree
+        else:
+            kernel = np.tanh(self.gamma * dot + self.coef0)
+        return kernel @ self.dual_coef + self.intercept
+
+    def _dot(self, X: np.ndarray) -> np.ndarray:
+        if X.shape[0] == 1:
+            columns = np.flatnonzero(X[0])
+            return (X[0, columns] @ self.support_vectors[columns])[np.newaxis, :]
+
+        # Mostly-set columns (the scaled numerics) go through one dense matrix product;
+        # the one-hot remainder is gathered row by row
+        column_counts = np.count_nonzero(X, axis=0)
+        dense = column_counts > self.SPARSE_DENSITY * X.shape[0]
+        out = X[:, dense] @ self.support_vectors[dense]
+        sparse_columns = np.flatnonzero(~dense & (column_counts > 0))
+        if len(sparse_columns) == 0:
+            return out
+
+        sparse = X[:, sparse_columns]
+        for start in range(0, X.shape[0], self.BLOCK_ROWS):
+            block = sparse[start:start + self.BLOCK_ROWS]
+            # Pack each row's non-zeros into a (rows, k) gather table padded with zeros
+            counts = np.count_nonzero(block, axis=1)
+            rows, cols = np.nonzero(block)
+            slots = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+            k = int(counts.max())
+            columns = np.zeros((len(block), k), dtype=np.intp)
+            values = np.zeros((len(block), k), dtype=np.float64)
+            columns[rows, slots] = sparse_columns[cols]
+            values[rows, slots] = block[rows, cols]
+
+            acc = out[start:start + len(block)]
+            for j in range(k):
+                gathered = self.support_vectors[columns[:, j]]
+                if np.all(values[:, j] == 1.0):
+                    # Plain one-hot indicator: no scaling needed
+                    acc += gathered
+                else:
+                    acc += values[:, j:j + 1] * gathered
+        return out
+
+    def predict_one(self, x) -> float:
+        return float(self.predict(x)[0])
+
+
+def svr_engine(artifacts) -> SVREngine:
+    """
+    Engine for the registry's current model, compiled once per model version.
+    """
+    engine = _engines.get(artifacts.version)
+    if engine is None:
+        with _lock:
+            engine = _engines.get(artifacts.version)
+            if engine is None:
+                engine = SVREngine.from_model(artifacts.model)
+                _engines.clear()
+                _engines[artifacts.version] = engine
+    return engine
+
+
+if __name__ == "__main__":
+    # Accuracy check against sklearn plus single-row and batch throughput
+    import timeit
+
+    import pandas as pd
+
+    from fast_encoder import compiled_encoder
+    from model_registry import get_model_artifacts
+
+    artifacts = get_model_artifacts()
+    encoder = compiled_encoder(artifacts)
+    engine = svr_engine(artifacts)
+
+    data = pd.read_csv("dataset/preprocessed_data.csv")
+    X = encoder.encode_frame(data)
+    expected = artifacts.model.predict(X)
+    actual = engine.predict(X)
+    max_error = np.max(np.abs(actual - expected))
+    assert np.allclose(actual, expected, rtol=1e-9, atol=1e-9), f"max abs error {max_error}"
+    print(f"Accuracy OK: {len(X)} rows, max abs error {max_error:.2e}")
+
+    row = X[:1]
+    n = 2000
+    sklearn_one = timeit.timeit(lambda: artifacts.model.predict(row), number=n) / n
+    engine_one = timeit.timeit(lambda: engine.predict(row), number=n) / n
+    print(f"single row  sklearn: {sklearn_one * 1e6:10.1f} us   engine: {engine_one * 1e6:8.1f} us")
+
+    n = 5
+    sklearn_batch = timeit.timeit(lambda: artifacts.model.predict(X), number=n) / n
+    engine_batch = timeit.timeit(lambda: engine.predict(X), number=n) / n
+    print(f"batch       sklearn: {len(X) / sklearn_batch:10,.0f} rows/s   engine: {len(X) / engine_batch:10,.0f} rows/s")